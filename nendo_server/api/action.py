@@ -2,12 +2,16 @@
 """Action routes of the Nendo API Server."""
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
+import xxhash
 from api.response import NendoHTTPResponse
 from api.utils import APIRouter
-from auth.auth_users import fastapi_users
-from fastapi import Depends, HTTPException, Response
+from auth.auth_users import current_user
+from fastapi import Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
 from handler.nendo_handler_factory import HandlerType, NendoHandlerFactory
 
 if TYPE_CHECKING:
@@ -20,7 +24,7 @@ router = APIRouter()
 # @router.options("/", name="actions:options", response_model=NendoHTTPResponse)
 # def get_actions_options(
 #     handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-#     user: User = Depends(fastapi_users.current_user()),
+#     user: User = Depends(current_user),
 # ):
 #     actions_handler = handler_factory.create(handler_type=HandlerType.ACTIONS)
 #     try:
@@ -30,52 +34,67 @@ router = APIRouter()
 #     return NendoHTTPResponse(data=options, has_next=False, cursor=0)
 
 
-async def set_no_cache_headers(response):
-    response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-    response.headers["Pragma"] = "no-cache"
-    response.headers["Expires"] = "0"
+def conditional_response(request: Request, content: Any) -> Response:
+    """Return the content with an ETag, or a 304 if the client's copy is current."""
+    response = ORJSONResponse(jsonable_encoder(content))
+    # a fast non-cryptographic hash is sufficient for a cache validator
+    etag = f'"{xxhash.xxh3_64_hexdigest(response.body)}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache, must-revalidate",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
 
 
-@router.get("/", name="all_user_actions:status", response_model=NendoHTTPResponse)
+@router.get("/", name="all_user_actions:status")
 async def get_all_action_statuses(
-    response: Response,
+    request: Request,
     handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    user: User = Depends(current_user),
 ):
     """Retrieve all actions and their statuses for a given user."""
-    await set_no_cache_headers(response)
     actions_handler = handler_factory.create(handler_type=HandlerType.ACTIONS)
     try:
-        all_action_statuses = actions_handler.get_all_action_statuses(
+        all_action_statuses = await run_in_threadpool(
+            actions_handler.get_all_action_statuses,
             user_id=str(user.id),
         )
     except Exception as e:
         actions_handler.logger.error(e)
         raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
 
-    return NendoHTTPResponse(data=all_action_statuses, has_next=False, cursor=0)
+    return conditional_response(
+        request,
+        NendoHTTPResponse(data=all_action_statuses, has_next=False, cursor=0),
+    )
 
 
-@router.get("/{action_id}", name="action:status", response_model=NendoHTTPResponse)
+@router.get("/{action_id}", name="action:status")
 async def get_action_status(
     action_id: str,
-    response: Response,
+    request: Request,
     handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    user: User = Depends(current_user),
 ):
     """Retrieve the status of an action."""
-    await set_no_cache_headers(response)
-
     actions_handler = handler_factory.create(handler_type=HandlerType.ACTIONS)
     try:
-        action_status = actions_handler.get_action_status(
+        action_status = await run_in_threadpool(
+            actions_handler.get_action_status,
             user_id=str(user.id),
             action_id=action_id,
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
 
-    return NendoHTTPResponse(data=action_status, has_next=False, cursor=0)
+    return conditional_response(
+        request,
+        NendoHTTPResponse(data=action_status, has_next=False, cursor=0),
+    )
 
 
 # TODO creation of actions should be done by the apps themselves
@@ -85,7 +104,7 @@ async def get_action_status(
 # def create_action(
 #     trigger_action: TriggerActionMethod,
 #     handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-#     user: User = Depends(fastapi_users.current_user()),
+#     user: User = Depends(current_user),
 # ):
 #     """Create a new action."""
 #     actions_handler = handler_factory.create(handler_type=HandlerType.ACTIONS)
@@ -105,7 +124,7 @@ async def get_action_status(
 def abort_action(
     action_id: str,
     handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    user: User = Depends(current_user),
 ):
     """Cancel an action."""
     actions_handler = handler_factory.create(handler_type=HandlerType.ACTIONS)
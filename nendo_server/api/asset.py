@@ -3,58 +3,181 @@
 from __future__ import annotations
 
 import os
-import subprocess
+import shutil
 import tempfile
+import threading
 import time
-from typing import TYPE_CHECKING, List, Optional
+import zipfile
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
-import aiofiles
+import anyio
+import config
 from api.response import NendoHTTPResponse
 from api.utils import APIRouter
-from auth.auth_users import fastapi_users
+from auth.auth_users import current_optional_user, current_user
+from cachetools import TTLCache
 from fastapi import Body, Depends, HTTPException, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from handler.nendo_handler_factory import HandlerType, NendoHandlerFactory
+from pydantic import BaseModel, ConfigDict
 from starlette.responses import (
     FileResponse,
+    StreamingResponse,
 )
 from utils import create_spectrogram
+from zipstream import ZipStream
 
 if TYPE_CHECKING:
     from auth.auth_db import User
+    from handler.nendo_assets_handler import NendoAssetsHandler
+    from nendo import Nendo
 
 router = APIRouter()
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+# bounds the temp files and threadpool work of uploads processed at once
+UPLOAD_SEMAPHORE = anyio.Semaphore(config.get_settings().max_concurrent_uploads)
+
+
+class AudioFileResponse(FileResponse):
+    """FileResponse that reads audio files in larger chunks than the 64 KiB default."""
+
+    chunk_size = DOWNLOAD_CHUNK_SIZE
+
+
+class ActionSpec(BaseModel):
+    """Docker action that can be run on freshly uploaded tracks."""
+
+    model_config = ConfigDict(frozen=True)
+
+    name: str
+    image: str
+    script: str
+    plugins: Tuple[str, ...]
+    max_track_duration: float
+    max_chunk_duration: float
+    run_without_target: bool
+
+
 ACTIONS = {
-    "voiceanalysis": {
-        "name": "Voice Analysis",
-        "image": "nendo/voiceanalysis",
-        "script": "voiceanalysis/voiceanalysis.py",
-        "plugins": [
+    "voiceanalysis": ActionSpec(
+        name="Voice Analysis",
+        image="nendo/voiceanalysis",
+        script="voiceanalysis/voiceanalysis.py",
+        plugins=(
             "nendo_plugin_embed_clap",
             "nendo_plugin_transcribe_whisper",
             "nendo_plugin_textgen",
-        ],
-        "max_track_duration": 4500.,   # 2.5 hours per track
-        "max_chunk_duration": 36000.,  # 10 hours per chunk
-        "run_without_target": True,
-    },
-    "musicanalysis": {
-        "name": "Music Analysis",
-        "image": "nendo/musicanalysis",
-        "script": "musicanalysis/musicanalysis.py",
-        "plugins": [
+        ),
+        max_track_duration=4500.,   # 2.5 hours per track
+        max_chunk_duration=36000.,  # 10 hours per chunk
+        run_without_target=True,
+    ),
+    "musicanalysis": ActionSpec(
+        name="Music Analysis",
+        image="nendo/musicanalysis",
+        script="musicanalysis/musicanalysis.py",
+        plugins=(
             "nendo_plugin_embed_clap",
             "nendo_plugin_classify_core",
             "nendo_plugin_caption_lpmusiccaps",
-        ],
-        "max_track_duration": 420.,  # 7 minutes per track
-        "max_chunk_duration": 3600., # 60 minutes per chunk
-        "run_without_target": True,
-    },
+        ),
+        max_track_duration=420.,  # 7 minutes per track
+        max_chunk_duration=3600., # 60 minutes per chunk
+        run_without_target=True,
+    ),
 }
 
 
+def _write_upload(file: UploadFile, file_path: str):
+    """Copy the uploaded file to the given path in large chunks."""
+    with open(file_path, "wb", buffering=UPLOAD_CHUNK_SIZE) as out_file:
+        shutil.copyfileobj(file.file, out_file, length=UPLOAD_CHUNK_SIZE)
+
+
+def _zip_response(zip_file_name: str, file_paths: List[str]) -> StreamingResponse:
+    """Stream the given files to the client as an uncompressed zip archive."""
+    # audio is already compressed (or compresses poorly), so only store it
+    zip_stream = ZipStream(compress_type=zipfile.ZIP_STORED, sized=True)
+    for file_path in file_paths:
+        zip_stream.add_path(file_path, arcname=os.path.basename(file_path))
+
+    headers = {
+        "Content-Disposition": f'attachment; filename="{zip_file_name}"',
+        "Content-Length": str(len(zip_stream)),
+    }
+    return StreamingResponse(
+        iter(zip_stream), headers=headers, media_type="application/zip",
+    )
+
+
+@lru_cache(maxsize=4096)
+def _cached_audio_path(
+    assets_handler: NendoAssetsHandler,
+    track_id: str,
+    user_id: Optional[str] = None,
+) -> str:
+    """Look up the audio path of a track, remembering hits.
+
+    Unknown tracks raise instead of returning None, so misses are never cached.
+    """
+    filepath = assets_handler.get_audio_path(track_id, user_id=user_id)
+    if filepath is None:
+        raise HTTPException(status_code=404, detail="Track not found")
+    return filepath
+
+
+# an audio player issues many range requests for the same track,
+# so remember where its file is instead of querying the library every time
+AUDIO_FILE_CACHE_TTL = 60  # seconds
+_audio_files = TTLCache(maxsize=4096, ttl=AUDIO_FILE_CACHE_TTL)
+_audio_files_lock = threading.Lock()
+
+
+def cached_audio_file(
+    nendo_instance: Nendo, track_id: str,
+) -> Optional[Tuple[str, str]]:
+    """Look up the path and file name of a track's audio file, remembering hits."""
+    with _audio_files_lock:
+        if track_id in _audio_files:
+            return _audio_files[track_id]
+    track = nendo_instance.get_track(track_id=track_id)
+    if track is None:
+        return None
+    audio_file = (track.resource.src, track.resource.file_name)
+    with _audio_files_lock:
+        _audio_files[track_id] = audio_file
+    return audio_file
+
+
+def evict_audio_file(track_id: str):
+    """Forget the cached audio file of a track, e.g. when it is gone."""
+    with _audio_files_lock:
+        _audio_files.pop(track_id, None)
+
+
+def clear_audio_path_cache():
+    """Forget all cached audio paths, e.g. after tracks were deleted."""
+    _cached_audio_path.cache_clear()
+    with _audio_files_lock:
+        _audio_files.clear()
+
+
+def _stat_audio_file(filepath: str, prefer_mp3: bool = True):
+    """Get the file to serve for a track, preferring the transcoded mp3."""
+    candidates = (f"{os.path.splitext(filepath)[0]}.mp3",) if prefer_mp3 else ()
+    for path in (*candidates, filepath):
+        try:
+            return path, os.stat(path)
+        except OSError:
+            continue
+    return filepath, None
+
+
 @router.post("/audio", name="audio:post")
 async def upload_audio_post(
     request: Request,
@@ -62,82 +185,89 @@ async def upload_audio_post(
     collection_id: Optional[str] = Query(""),
     run_action: Optional[str] = Query(""),
     handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    user: User = Depends(current_user),
 ):
     assets_handler = handler_factory.create(handler_type=HandlerType.ASSETS)
     action_handler = handler_factory.create(handler_type=HandlerType.ACTIONS)
 
-    if assets_handler.user_reached_storage_limit(str(user.id)):
+    if await run_in_threadpool(
+        assets_handler.user_reached_storage_limit, str(user.id),
+    ):
         raise HTTPException(status_code=507, detail="Storage limit reached")
 
-    try:
-        temp_dir = tempfile.TemporaryDirectory()
+    async with UPLOAD_SEMAPHORE:
+        try:
+            temp_dir = tempfile.TemporaryDirectory()
 
-        tracks = []
+            tracks = []
 
-        async with aiofiles.open(
-            os.path.join(temp_dir.name, file.filename),
-            "wb",
-        ) as out_file:
-            while content := await file.read(1024):
-                await out_file.write(content)
-            await out_file.flush()
-            request.app.state.logger.info(f"Done writing tempfile: {out_file.name}")
+            temp_file_path = os.path.join(temp_dir.name, file.filename)
+            # copy the whole upload in a single threadpool hop
+            await run_in_threadpool(_write_upload, file, temp_file_path)
+            request.app.state.logger.info(f"Done writing tempfile: {temp_file_path}")
 
-            tracks = assets_handler.add_to_library(
-                file_path=out_file.name,
+            tracks = await run_in_threadpool(
+                assets_handler.add_to_library,
+                file_path=temp_file_path,
                 user_id=user.id,
             )
 
-    except Exception as e:
-        assets_handler.logger.exception(f"Error uploading: {e}")
-    finally:
-        temp_dir.cleanup()
+        except Exception as e:
+            assets_handler.logger.exception(f"Error uploading: {e}")
+        finally:
+            await run_in_threadpool(temp_dir.cleanup)
 
     if len(tracks) == 0:
         # TODO handle unsupported file type and throw 422
         # raise HTTPException(status_code=422, detail="Filetype not supported")
         return JSONResponse(status_code=500, content={"status": "failed"})
 
-    for track in tracks:
-        if not any([image.meta["image_type"] == "spectrogram" for image in track.images]):
-            action_handler.create_action(
-                user_id=str(user.id),
-                action_name="Render spectrogram",
-                gpu=False,
-                func=create_spectrogram,
-                track_ids=[track.id],
-            )
+    # render all missing spectrograms of the upload in a single job
+    spectrogram_track_ids = [
+        track.id for track in tracks
+        if not any(image.meta["image_type"] == "spectrogram" for image in track.images)
+    ]
+    if len(spectrogram_track_ids) > 0:
+        await run_in_threadpool(
+            action_handler.create_action,
+            user_id=str(user.id),
+            action_name="Render spectrogram",
+            gpu=False,
+            func=create_spectrogram,
+            track_ids=spectrogram_track_ids,
+        )
 
     return_id = str(tracks[0].id)
     # add track(s) to collection
-    if len(collection_id) > 0:
+    if collection_id:
         collection_handler = handler_factory.create(
             handler_type=HandlerType.COLLECTIONS,
         )
-        for track in tracks:
-            collection_handler.add_track_to_collection(
-                collection_id=collection_id,
-                track_id=track.id,
-            )
+        await run_in_threadpool(
+            collection_handler.add_tracks_to_collection,
+            collection_id=collection_id,
+            track_ids=[str(track.id) for track in tracks],
+        )
         return_id = f"collection/{collection_id}"
 
 
     return_dict = {"status": "success", "result_id": return_id}
-    if len(run_action) > 0:
-        if run_action not in ACTIONS:
+    if run_action:
+        action_spec = ACTIONS.get(run_action)
+        if action_spec is None:
             return JSONResponse(status_code=400, content={"status": "Unknown action"})
         for track in tracks:
-            action_id = action_handler.create_docker_action(
+            action_id = await run_in_threadpool(
+                action_handler.create_docker_action,
                 user_id=str(user.id),
-                image=ACTIONS[run_action]["image"],
+                image=action_spec.image,
                 gpu=True,
-                script_path=ACTIONS[run_action]["script"],
-                plugins=ACTIONS[run_action]["plugins"],
-                action_name=ACTIONS[run_action]["name"],
-                run_without_target=ACTIONS[run_action]["run_without_target"],
-                max_track_duration=ACTIONS[run_action]["max_track_duration"],
-                max_chunk_duration=ACTIONS[run_action]["max_chunk_duration"],
+                script_path=action_spec.script,
+                plugins=list(action_spec.plugins),
+                action_name=action_spec.name,
+                run_without_target=action_spec.run_without_target,
+                max_track_duration=action_spec.max_track_duration,
+                max_chunk_duration=action_spec.max_chunk_duration,
                 container_name="",
                 exec_run=False,
                 replace_plugin_data=False,
@@ -157,7 +287,7 @@ async def upload_audio_post(
 async def serve_audio_asset(
     track_id: str,
     handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: Optional[User] = Depends(fastapi_users.current_user(optional=True)),
+    user: Optional[User] = Depends(current_optional_user),
 ):
     if track_id is None or track_id == "":
         raise HTTPException(status_code=400, detail="track_id is required")
@@ -165,20 +295,25 @@ async def serve_audio_asset(
     assets_handler = handler_factory.create(handler_type=HandlerType.ASSETS)
 
     # if config.get_settings().environment == Environment.LOCAL.value:
-    filepath = assets_handler.get_audio_path(track_id)
-    if filepath is None:
-        raise HTTPException(status_code=404, detail="Track not found")
+    filepath = await run_in_threadpool(_cached_audio_path, assets_handler, track_id)
 
     # simple transcoding
-    filepath_mp3 = f"{os.path.splitext(filepath)[0]}.mp3"
-    if os.path.isfile(filepath_mp3):
-        filepath = filepath_mp3
+    filepath, stat_result = await run_in_threadpool(_stat_audio_file, filepath)
+    if stat_result is None:
+        # the track was deleted, possibly by another worker process
+        clear_audio_path_cache()
+        raise HTTPException(status_code=404, detail="Track not found")
 
+    # FileResponse answers Range requests with 206
     headers = {
         "Content-Disposition": f'attachment; filename="{os.path.basename(filepath)}"',
-        "Accept-Ranges": "bytes",
     }
-    return FileResponse(filepath, headers=headers, media_type="audio/wav")
+    return AudioFileResponse(
+        filepath,
+        headers=headers,
+        media_type="audio/wav",
+        stat_result=stat_result,
+    )
 
     # TODO re-enable bucket storage at some point
     # if config.get_settings().environment == Environment.REMOTE.value:
@@ -216,7 +351,7 @@ async def serve_audio_asset(
 async def download_track(
     track_id: str,
     handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    user: User = Depends(current_user),
 ):
     if track_id is None or track_id == "":
         raise HTTPException(status_code=400, detail="track_id is required")
@@ -224,14 +359,27 @@ async def download_track(
     assets_handler = handler_factory.create(handler_type=HandlerType.ASSETS)
 
     # if config.get_settings().environment == Environment.LOCAL:
-    filepath = assets_handler.get_audio_path(track_id, user_id=str(user.id))
-    if filepath is None:
+    filepath = await run_in_threadpool(
+        _cached_audio_path, assets_handler, track_id, user_id=str(user.id),
+    )
+    # downloads get the original file, not the transcoded mp3
+    filepath, stat_result = await run_in_threadpool(
+        _stat_audio_file, filepath, prefer_mp3=False,
+    )
+    if stat_result is None:
+        # the track was deleted, possibly by another worker process
+        clear_audio_path_cache()
         raise HTTPException(status_code=404, detail="Track not found")
 
     headers = {
         "Content-Disposition": f'attachment; filename="{os.path.basename(filepath)}"',
     }
-    return FileResponse(filepath, headers=headers, media_type="audio/wav")
+    return AudioFileResponse(
+        filepath,
+        headers=headers,
+        media_type="audio/wav",
+        stat_result=stat_result,
+    )
 
     # if config.get_settings().environment == Environment.REMOTE:
     #     # bucket_name = "BUCKET_NOT_FOUND"
@@ -272,11 +420,11 @@ async def download_track(
 
 
 @router.get("/audio/download/collection/{collection_id}", name="collection:download")
-def download_collection(
+async def download_collection(
     request: Request,
     collection_id: str,
     handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    user: User = Depends(current_user),
 ):
     if collection_id is None or collection_id == "":
         raise HTTPException(status_code=400, detail="collection_id is required")
@@ -284,21 +432,15 @@ def download_collection(
     assets_handler = handler_factory.create(handler_type=HandlerType.ASSETS)
 
     # if config.get_settings().environment == Environment.LOCAL.value:
-    track_paths = assets_handler.get_collection_audio_paths(collection_id)
+    track_paths = await run_in_threadpool(
+        assets_handler.get_collection_audio_paths, collection_id,
+    )
     if track_paths is None:
         raise HTTPException(status_code=404, detail="Collection is empty")
 
-    zip_file_name = os.path.join(
-        "/tmp/",
-        f"collection_{collection_id}_{time.time_ns() // 1000000}.zip",
-    )
-    files_str = " ".join(track_paths)
-    subprocess.run(f"zip {zip_file_name} {files_str}", check=True, shell=True)
-
-    headers = {
-        "Content-Disposition": f'attachment; filename="{os.path.basename(zip_file_name)}"',
-    }
-    return FileResponse(zip_file_name, headers=headers, media_type="application/zip")
+    zip_file_name = f"collection_{collection_id}_{time.time_ns() // 1000000}.zip"
+    # sizing the archive stats every file
+    return await run_in_threadpool(_zip_response, zip_file_name, track_paths)
 
     # TODO re-enable bucket storage at some point
     # if config.get_settings().environment == Environment.REMOTE:
@@ -341,38 +483,31 @@ def download_collection(
     )
 
 @router.post("/audio/download/tracks", name="tracks:download")
-def download_tracks(
+async def download_tracks(
     request: Request,
     track_ids: List = Body(...),
     handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    user: User = Depends(current_user),
 ):
     if track_ids is None or len(track_ids) == 0:
         raise HTTPException(status_code=400, detail="track IDs are required")
 
     assets_handler = handler_factory.create(handler_type=HandlerType.ASSETS)
 
-    track_paths = assets_handler.get_tracks_audio_paths(track_ids)
+    track_paths = await run_in_threadpool(
+        assets_handler.get_tracks_audio_paths, track_ids,
+    )
     if track_paths is None:
         raise HTTPException(status_code=404, detail="Collection is empty")
 
-    zip_file_name = os.path.join(
-        "/tmp/",
-        f"tracks_{time.time_ns() // 1000000}.zip",
-    )
-    files_str = " ".join(track_paths)
-    subprocess.run(f"zip {zip_file_name} {files_str}", check=True, shell=True)
-
-    headers = {
-        "Content-Disposition": f'attachment; filename="{os.path.basename(zip_file_name)}"',
-    }
-    return FileResponse(zip_file_name, headers=headers, media_type="application/zip")
+    zip_file_name = f"tracks_{time.time_ns() // 1000000}.zip"
+    return await run_in_threadpool(_zip_response, zip_file_name, track_paths)
 
 @router.get("/image/{image_file_name}", name="image:get")
 async def serve_image_asset(
     image_file_name: str,
     handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: Optional[User] = Depends(fastapi_users.current_user(optional=True)),
+    user: Optional[User] = Depends(current_optional_user),
 ):
     if image_file_name is None or image_file_name == "":
         raise HTTPException(status_code=400, detail="image_file_name is required")
@@ -392,14 +527,18 @@ async def serve_image_asset(
 @router.get("/info", name="info:get")
 async def get_asset_info(
     handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    user: User = Depends(current_user),
 ):
     assets_handler = handler_factory.create(handler_type=HandlerType.ASSETS)
 
     # if config.get_settings().environment == Environment.LOCAL:
     space_available = assets_handler.get_user_storage_size(str(user.id))
-    space_used = assets_handler.get_user_storage_used(str(user.id))
-    num_tracks = assets_handler.get_user_num_tracks(str(user.id))
+    space_used = await run_in_threadpool(
+        assets_handler.get_user_storage_used, str(user.id),
+    )
+    num_tracks = await run_in_threadpool(
+        assets_handler.get_user_num_tracks, str(user.id),
+    )
 
     returned_info = {
         "space_used": space_used,
@@ -2,79 +2,99 @@
 """Nendo server collection routes."""
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
+import asyncio
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 from uuid import UUID  # noqa: TCH003
 
-from api.response import NendoHTTPResponse
-from api.utils import APIRouter
-from auth.auth_users import fastapi_users
+from api.response import CompactNendoHTTPResponse, NendoHTTPResponse
+from api.utils import APIRouter, NendoErrorRoute
+from auth.auth_users import current_user
 from dto.core import CollectionSmall, TrackSmall
 from fastapi import Body, Depends, HTTPException
-from fastapi.responses import JSONResponse
-from handler.nendo_handler_factory import HandlerType, NendoHandlerFactory
-from pydantic import BaseModel
+from fastapi.concurrency import run_in_threadpool
+from handler.nendo_handler_factory import get_collections_handler
+from pydantic import BaseModel, TypeAdapter
 
 from utils import extract_search_filter
 
 if TYPE_CHECKING:
     from auth.auth_db import User
+    from handler.nendo_collections_handler import NendoCollectionsHandler
 
 
-router = APIRouter()
+router = APIRouter(route_class=NendoErrorRoute)
 
 DEFAULT_PAGE_SIZE = 10
 
+# validate whole result lists in a single pydantic-core call
+_COLLECTIONS_ADAPTER = TypeAdapter(List[CollectionSmall])
+_TRACKS_ADAPTER = TypeAdapter(List[TrackSmall])
 
-@router.get("/", name="collections:get", response_model=NendoHTTPResponse)
+
+def _collection_small(collection: Any) -> Optional[CollectionSmall]:
+    """Read only the response fields off a collection, skipping its nendo_instance."""
+    if collection is None:
+        return None
+    return CollectionSmall.model_validate(collection, from_attributes=True)
+
+
+@router.get(
+    "/",
+    name="collections:get",
+    response_model=CompactNendoHTTPResponse[List[CollectionSmall]],
+)
 async def get_collections(
     cursor: int = 0,
     limit: int = DEFAULT_PAGE_SIZE,
     name: Optional[str] = None,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    collections_handler: NendoCollectionsHandler = Depends(get_collections_handler),
+    user: User = Depends(current_user),
 ):
-    collection_handler = handler_factory.create(handler_type=HandlerType.COLLECTIONS)
-
-    try:
-        offset = cursor * limit
-        collections = collection_handler.get_collections(
-            user_id=user.id,
-            limit=limit,
-            offset=offset,
-            name=name,
-            collection_types=["collection", "playlist", "favorites"],
-        )
-        collections = [CollectionSmall.parse_obj(c.dict()) for c in collections]
-
-        has_next = len(collections) == limit
-        next_cursor = cursor + 1 if has_next else cursor
-    except Exception as e:
-        collection_handler.logger.exception(f"Nendo error: {e}")
-        raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
+    offset = cursor * limit
+    # fetch one extra row to learn whether another page exists
+    collections = await run_in_threadpool(
+        collections_handler.get_collections,
+        user_id=user.id,
+        limit=limit + 1,
+        offset=offset,
+        name=name,
+        collection_types=["collection", "playlist", "favorites"],
+    )
+    has_next = len(collections) > limit
+    collections = _COLLECTIONS_ADAPTER.validate_python(
+        collections[:limit], from_attributes=True,
+    )
+    next_cursor = cursor + 1 if has_next else cursor
 
-    return NendoHTTPResponse(data=collections, has_next=False, cursor=next_cursor)
+    return NendoHTTPResponse(
+        data=collections, has_next=has_next, cursor=next_cursor,
+    )
 
 
-@router.get("/{collection_id}", name="collection:get", response_model=NendoHTTPResponse)
+@router.get(
+    "/{collection_id}",
+    name="collection:get",
+    response_model=CompactNendoHTTPResponse,
+)
 async def get_collection(
     collection_id: str,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    collections_handler: NendoCollectionsHandler = Depends(get_collections_handler),
+    user: User = Depends(current_user),
 ):
-    collection_handler = handler_factory.create(handler_type=HandlerType.COLLECTIONS)
-
-    try:
-        collection = collection_handler.get_collection(collection_id=collection_id)
-        delattr(collection, "nendo_instance")
-        collection_size = collection_handler.get_collection_size(
+    # both lookups are independent, so run them side by side
+    collection, collection_size = await asyncio.gather(
+        run_in_threadpool(
+            collections_handler.get_collection, collection_id=collection_id,
+        ),
+        run_in_threadpool(
+            collections_handler.get_collection_size,
             collection_id=collection_id,
-        )
-    except Exception as e:
-        collection_handler.logger.exception(f"Nendo error: {e}")
-        raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
+        ),
+    )
+    collection = _collection_small(collection)
 
     if collection is None:
-        return JSONResponse(status_code=404, content={"detail": "Collection not found"})
+        raise HTTPException(status_code=404, detail="Collection not found")
 
     return NendoHTTPResponse(
         data={"collection": collection, "size": collection_size},
@@ -84,26 +104,36 @@ async def get_collection(
 
 
 @router.get(
-    "/{collection_id}/tracks", name="collection:get", response_model=NendoHTTPResponse,
+    "/{collection_id}/tracks",
+    name="collection:get",
+    response_model=CompactNendoHTTPResponse,
 )
 async def get_collection_tracks(
     collection_id: str,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    cursor: int = 0,
+    limit: Optional[int] = None,
+    collections_handler: NendoCollectionsHandler = Depends(get_collections_handler),
+    user: User = Depends(current_user),
 ):
-    tracks_handler = handler_factory.create(handler_type=HandlerType.COLLECTIONS)
-
-    try:
-        tracks = tracks_handler.get_collection_tracks(collection_id=collection_id)
-        tracks = [TrackSmall.parse_obj(track.dict()) for track in tracks]
-    except Exception as e:
-        tracks_handler.logger.exception(f"Nendo error: {e}")
-        raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
+    tracks = await run_in_threadpool(
+        collections_handler.get_collection_tracks, collection_id=collection_id,
+    )
 
     if tracks is None:
-        return JSONResponse(status_code=404, content={"detail": "Collection not found"})
+        raise HTTPException(status_code=404, detail="Collection not found")
 
-    return NendoHTTPResponse(data=tracks, has_next=False, cursor=0)
+    # without a limit the whole collection is returned
+    has_next = False
+    next_cursor = cursor
+    if limit is not None:
+        offset = cursor * limit
+        has_next = len(tracks) > offset + limit
+        next_cursor = cursor + 1 if has_next else cursor
+        tracks = tracks[offset:offset + limit]
+
+    tracks = _TRACKS_ADAPTER.validate_python(tracks, from_attributes=True)
+
+    return NendoHTTPResponse(data=tracks, has_next=has_next, cursor=next_cursor)
 
 
 class CreateCollectionParam(BaseModel):
@@ -113,102 +143,95 @@ class CreateCollectionParam(BaseModel):
     track_ids: List[str] = []
 
 
-@router.post("/", name="collection:post", response_model=NendoHTTPResponse)
+@router.post(
+    "/",
+    name="collection:post",
+    response_model=CompactNendoHTTPResponse[CollectionSmall],
+)
 async def create_collection(
     create_collection_param: CreateCollectionParam,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    collections_handler: NendoCollectionsHandler = Depends(get_collections_handler),
+    user: User = Depends(current_user),
 ):
-    collections_handler = handler_factory.create(handler_type=HandlerType.COLLECTIONS)
-
-    try:
-        collection = collections_handler.create_collection(
-            name=create_collection_param.name,
-            description=create_collection_param.description,
-            user_id=user.id,
-            collection_type="collection",
-            track_ids=create_collection_param.track_ids,
-        )
-        delattr(collection, "nendo_instance")
-    except Exception as e:
-        collections_handler.logger.exception(f"Nendo error: {e}")
-        raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
+    collection = await run_in_threadpool(
+        collections_handler.create_collection,
+        name=create_collection_param.name,
+        description=create_collection_param.description,
+        user_id=user.id,
+        collection_type="collection",
+        track_ids=create_collection_param.track_ids,
+    )
+    collection = _collection_small(collection)
 
     if collection is None:
-        return JSONResponse(
-            status_code=500, content={"detail": "Error creating collection"},
+        raise HTTPException(
+            status_code=500, detail="Error creating collection",
         )
 
     return NendoHTTPResponse(data=collection, has_next=False, cursor=0)
 
 
 class UpdateCollectionParam(BaseModel):
-    name: Optional[str] = (None,)
-    description: Optional[str] = (None,)
-    collection_type: Optional[str] = (None,)
+    name: Optional[str] = None
+    description: Optional[str] = None
+    collection_type: Optional[str] = None
 
 
 @router.patch(
     "/update/{collection_id}",
     name="collection:update",
-    response_model=NendoHTTPResponse,
+    response_model=CompactNendoHTTPResponse[CollectionSmall],
 )
 async def update_collection(
     collection_id: str,
     update_collection_param: UpdateCollectionParam,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    collections_handler: NendoCollectionsHandler = Depends(get_collections_handler),
+    user: User = Depends(current_user),
 ):
-    collections_handler = handler_factory.create(handler_type=HandlerType.COLLECTIONS)
-
-    try:
-        collection = collections_handler.update_collection(
-            collection_id=collection_id,
-            name=update_collection_param.name,
-            description=update_collection_param.description,
-            collection_type=update_collection_param.collection_type,
-            user_id=user.id,
-        )
-        delattr(collection, "nendo_instance")
-    except Exception as e:
-        collections_handler.logger.exception(f"Nendo error: {e}")
-        raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
+    collection = await run_in_threadpool(
+        collections_handler.update_collection,
+        collection_id=collection_id,
+        name=update_collection_param.name,
+        description=update_collection_param.description,
+        collection_type=update_collection_param.collection_type,
+        user_id=user.id,
+    )
+    collection = _collection_small(collection)
 
     if collection is None:
-        return JSONResponse(
-            status_code=500, content={"detail": "Error updating collection"},
+        raise HTTPException(
+            status_code=500, detail="Error updating collection",
         )
 
     return NendoHTTPResponse(data=collection, has_next=False, cursor=0)
 
 
-@router.put("/{collection_id}", name="collection:put", response_model=NendoHTTPResponse)
+@router.put(
+    "/{collection_id}",
+    name="collection:put",
+    response_model=CompactNendoHTTPResponse[CollectionSmall],
+)
 async def add_track_to_collection(
     collection_id: str,
     track_id: Optional[str] = None,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    collections_handler: NendoCollectionsHandler = Depends(get_collections_handler),
+    user: User = Depends(current_user),
 ):
-    collections_handler = handler_factory.create(handler_type=HandlerType.COLLECTIONS)
-
     if track_id is None:
-        return JSONResponse(
-            status_code=400, content={"detail": "Error track_id is required"},
+        raise HTTPException(
+            status_code=400, detail="Error track_id is required",
         )
 
-    try:
-        collection = collections_handler.add_track_to_collection(
-            track_id=track_id,
-            collection_id=collection_id,
-        )
-        delattr(collection, "nendo_instance")
-    except Exception as e:
-        collections_handler.logger.exception(f"Nendo error: {e}")
-        raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
+    collection = await run_in_threadpool(
+        collections_handler.add_track_to_collection,
+        track_id=track_id,
+        collection_id=collection_id,
+    )
+    collection = _collection_small(collection)
 
     if collection is None:
-        return JSONResponse(
-            status_code=500, content={"detail": "Error adding track to a collection"},
+        raise HTTPException(
+            status_code=500, detail="Error adding track to a collection",
         )
 
     return NendoHTTPResponse(data=collection, has_next=False, cursor=0)
@@ -216,29 +239,24 @@ async def add_track_to_collection(
 @router.put(
     "/{collection_id}/tracks/selected",
     name="collection: add selected tracks to collection",
-    response_model=NendoHTTPResponse,
+    response_model=CompactNendoHTTPResponse[CollectionSmall],
 )
 async def add_selected_tracks_to_collection(
     collection_id: str,
     track_ids: List = Body(...),
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    collections_handler: NendoCollectionsHandler = Depends(get_collections_handler),
+    user: User = Depends(current_user),
 ):
-    collections_handler = handler_factory.create(handler_type=HandlerType.COLLECTIONS)
-
-    try:
-        collection = collections_handler.add_tracks_to_collection(
-            collection_id=collection_id,
-            track_ids=track_ids,
-        )
-        delattr(collection, "nendo_instance")
-    except Exception as e:
-        collections_handler.logger.exception(f"Nendo error: {e}")
-        raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
+    collection = await run_in_threadpool(
+        collections_handler.add_tracks_to_collection,
+        collection_id=collection_id,
+        track_ids=track_ids,
+    )
+    collection = _collection_small(collection)
 
     if collection is None:
-        return JSONResponse(
-            status_code=500, content={"detail": "Error adding track to a collection"},
+        raise HTTPException(
+            status_code=500, detail="Error adding track to a collection",
         )
 
     return NendoHTTPResponse(data=collection, has_next=False, cursor=0)
@@ -246,19 +264,16 @@ async def add_selected_tracks_to_collection(
 @router.put(
     "/{collection_id}/tracks",
     name="collection: add tracks to collection",
-    response_model=NendoHTTPResponse,
+    response_model=CompactNendoHTTPResponse[CollectionSmall],
 )
 async def add_tracks_to_collection(
     collection_id: str,
     search_filter: Optional[str] = None,
     related_collection_id: Optional[str] = None,
     track_type: Optional[str] = None,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    collections_handler: NendoCollectionsHandler = Depends(get_collections_handler),
+    user: User = Depends(current_user),
 ):
-    collections_handler = handler_factory.create(handler_type=HandlerType.COLLECTIONS)
-    tracks_handler = handler_factory.create(handler_type=HandlerType.TRACKS)
-
     try:
         search_filters = extract_search_filter(search_filter)
     except Exception as e:
@@ -270,29 +285,21 @@ async def add_tracks_to_collection(
         track_type_list = None
     else:
         track_type_list = track_type.split(",")
-    tracks, _ = tracks_handler.get_tracks(
+
+    collection = await run_in_threadpool(
+        collections_handler.add_tracks_to_collection_by_filter,
+        collection_id=collection_id,
         filters=search_filters["filters"],
         search_meta=search_filters["search_meta"],
         track_type=track_type_list,
-        collection_id=related_collection_id if len(related_collection_id) > 0 else None,
+        related_collection_id=related_collection_id or None,
         user_id=str(user.id),
     )
-    
-    track_ids = [str(track.id) for track in tracks]
-
-    try:
-        collection = collections_handler.add_tracks_to_collection(
-            collection_id=collection_id,
-            track_ids=track_ids,
-        )
-        delattr(collection, "nendo_instance")
-    except Exception as e:
-        collections_handler.logger.exception(f"Nendo error: {e}")
-        raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
+    collection = _collection_small(collection)
 
     if collection is None:
-        return JSONResponse(
-            status_code=500, content={"detail": "Error adding track to a collection"},
+        raise HTTPException(
+            status_code=500, detail="Error adding track to a collection",
         )
 
     return NendoHTTPResponse(data=collection, has_next=False, cursor=0)
@@ -300,42 +307,34 @@ async def add_tracks_to_collection(
 @router.patch(
     "/{collection_id}/tracks/selected",
     name="collection: remove selected tracks from collection",
-    response_model=NendoHTTPResponse,
+    response_model=CompactNendoHTTPResponse,
 )
 async def remove_selected_tracks_from_collection(
     collection_id: str,
     track_ids: List = Body(...),
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    collections_handler: NendoCollectionsHandler = Depends(get_collections_handler),
+    user: User = Depends(current_user),
 ):
-    collections_handler = handler_factory.create(handler_type=HandlerType.COLLECTIONS)
-
-    try:
-        result = collections_handler.remove_tracks_from_collection(
-            collection_id=collection_id,
-            track_ids=track_ids,
-        )
-    except Exception as e:
-        collections_handler.logger.exception(f"Nendo error: {e}")
-        raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
+    result = await run_in_threadpool(
+        collections_handler.remove_tracks_from_collection,
+        collection_id=collection_id,
+        track_ids=track_ids,
+    )
 
     return NendoHTTPResponse(data=result)
 
 @router.patch(
     "/{collection_id}/remove/tracks",
     name="collection: remove tracks from collection",
-    response_model=NendoHTTPResponse,
+    response_model=CompactNendoHTTPResponse,
 )
 async def remove_tracks_from_collection(
     collection_id: str,
     search_filter: Optional[str] = None,
     track_type: Optional[str] = None,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    collections_handler: NendoCollectionsHandler = Depends(get_collections_handler),
+    user: User = Depends(current_user),
 ):
-    collections_handler = handler_factory.create(handler_type=HandlerType.COLLECTIONS)
-    tracks_handler = handler_factory.create(handler_type=HandlerType.TRACKS)
-
     try:
         search_filters = extract_search_filter(search_filter)
     except Exception as e:
@@ -347,24 +346,15 @@ async def remove_tracks_from_collection(
         track_type_list = None
     else:
         track_type_list = track_type.split(",")
-    tracks, _ = tracks_handler.get_tracks(
+
+    result = await run_in_threadpool(
+        collections_handler.remove_tracks_from_collection_by_filter,
+        collection_id=str(collection_id),
         filters=search_filters["filters"],
         search_meta=search_filters["search_meta"],
         track_type=track_type_list,
         user_id=str(user.id),
-        collection_id=str(collection_id),
     )
-    
-    track_ids = [str(track.id) for track in tracks]
-
-    try:
-        result = collections_handler.remove_tracks_from_collection(
-            collection_id=collection_id,
-            track_ids=track_ids,
-        )
-    except Exception as e:
-        collections_handler.logger.exception(f"Nendo error: {e}")
-        raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
 
     return NendoHTTPResponse(data=result)
 
@@ -372,77 +362,64 @@ async def remove_tracks_from_collection(
 @router.patch(
     "/{collection_id}/remove/{track_id}",
     name="collection:remove track from collection",
-    response_model=NendoHTTPResponse,
+    response_model=CompactNendoHTTPResponse,
 )
 async def remove_track_from_collection(
     collection_id: str,
     track_id: str,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    collections_handler: NendoCollectionsHandler = Depends(get_collections_handler),
+    user: User = Depends(current_user),
 ):
-    collections_handler = handler_factory.create(handler_type=HandlerType.COLLECTIONS)
-
-    try:
-        result = collections_handler.remove_track_from_collection(
-            track_id=track_id, collection_id=collection_id,
-        )
-    except Exception as e:
-        collections_handler.logger.exception(f"Nendo error: {e}")
-        raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
+    result = await run_in_threadpool(
+        collections_handler.remove_track_from_collection,
+        track_id=track_id, collection_id=collection_id,
+    )
 
     return NendoHTTPResponse(data=result)
 
 @router.put(
     "/{collection_id}/save",
     name="collection:make temporary collection permanent",
-    response_model=NendoHTTPResponse,
+    response_model=CompactNendoHTTPResponse[CollectionSmall],
 )
 async def save_collection_from_temp(
     collection_id: str,
     name: str,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    collections_handler: NendoCollectionsHandler = Depends(get_collections_handler),
+    user: User = Depends(current_user),
 ):
-    collections_handler = handler_factory.create(handler_type=HandlerType.COLLECTIONS)
-
-    try:
-        collection = collections_handler.save_collection_from_temp(
-            collection_id=collection_id,
-            name=name,
-        )
-        delattr(collection, "nendo_instance")
-    except Exception as e:
-        collections_handler.logger.exception(f"Nendo error: {e}")
-        raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
+    collection = await run_in_threadpool(
+        collections_handler.save_collection_from_temp,
+        collection_id=collection_id,
+        name=name,
+    )
+    collection = _collection_small(collection)
 
     return NendoHTTPResponse(data=collection)
 
 
 @router.delete(
-    "/{collection_id}", name="collection:delete", response_model=NendoHTTPResponse,
+    "/{collection_id}",
+    name="collection:delete",
+    response_model=CompactNendoHTTPResponse,
 )
 async def delete_collection(
     collection_id: str,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    collections_handler: NendoCollectionsHandler = Depends(get_collections_handler),
+    user: User = Depends(current_user),
 ):
-    collections_handler = handler_factory.create(handler_type=HandlerType.COLLECTIONS)
-
-    try:
-        result = collections_handler.delete_collection(
-            collection_id=collection_id,
-            user_id=str(user.id),
-        )
-    except Exception as e:
-        collections_handler.logger.exception(f"Nendo error: {e}")
-        raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
+    result = await run_in_threadpool(
+        collections_handler.delete_collection,
+        collection_id=collection_id,
+        user_id=str(user.id),
+    )
 
     return NendoHTTPResponse(data=result)
 
 
 class AddRelatedCollectionModel(BaseModel):
-    track_ids: List[Union[str, UUID]]
-    collection_id: Union[str, UUID]
+    track_ids: List[UUID]
+    collection_id: UUID
     name: str
     description: str = ""
     relationship_type: str = "relationship"
@@ -450,33 +427,30 @@ class AddRelatedCollectionModel(BaseModel):
 
 
 @router.post(
-    "/related", name="related_collection:post", response_model=NendoHTTPResponse,
+    "/related",
+    name="related_collection:post",
+    response_model=CompactNendoHTTPResponse,
 )
 async def create_related_collection(
     add_related_collection_model: AddRelatedCollectionModel,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    collections_handler: NendoCollectionsHandler = Depends(get_collections_handler),
+    user: User = Depends(current_user),
 ):
-    collections_handler = handler_factory.create(handler_type=HandlerType.COLLECTIONS)
-
-    try:
-        collection = collections_handler.add_related_collection(
-            track_ids=add_related_collection_model.track_ids,
-            collection_id=add_related_collection_model.collection_id,
-            name=add_related_collection_model.name,
-            description=add_related_collection_model.description,
-            user_id=user.id,
-            relationship_type=add_related_collection_model.relationship_type,
-            meta=add_related_collection_model.meta,
-        )
-    except Exception as e:
-        collections_handler.logger.exception(f"Nendo error: {e}")
-        raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
+    collection = await run_in_threadpool(
+        collections_handler.add_related_collection,
+        track_ids=add_related_collection_model.track_ids,
+        collection_id=add_related_collection_model.collection_id,
+        name=add_related_collection_model.name,
+        description=add_related_collection_model.description,
+        user_id=user.id,
+        relationship_type=add_related_collection_model.relationship_type,
+        meta=add_related_collection_model.meta,
+    )
 
     if collection is None:
-        return JSONResponse(
+        raise HTTPException(
             status_code=422,
-            content={"detail": "Error creating related collection"},
+            detail="Error creating related collection",
         )
 
     return NendoHTTPResponse(data=collection, has_next=False, cursor=0)
@@ -485,28 +459,23 @@ async def create_related_collection(
 @router.get(
     "/related/{collection_id}",
     name="related_collection:get",
-    response_model=NendoHTTPResponse,
+    response_model=CompactNendoHTTPResponse,
 )
 async def get_related_collection(
     collection_id: str,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    collections_handler: NendoCollectionsHandler = Depends(get_collections_handler),
+    user: User = Depends(current_user),
 ):
-    collections_handler = handler_factory.create(handler_type=HandlerType.COLLECTIONS)
-
-    try:
-        collection = collections_handler.get_related_collections(
-            user_id=user.id,
-            collection_id=collection_id,
-        )
-    except Exception as e:
-        collections_handler.logger.exception(f"Nendo error: {e}")
-        raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
+    collection = await run_in_threadpool(
+        collections_handler.get_related_collections,
+        user_id=user.id,
+        collection_id=collection_id,
+    )
 
     if collection is None:
-        return JSONResponse(
+        raise HTTPException(
             status_code=404,
-            content={"detail": "Collection not found"},
+            detail="Collection not found",
         )
 
     return NendoHTTPResponse(data=collection, has_next=False, cursor=0)
@@ -1,10 +1,23 @@
-from typing import Any
+from typing import Any, Generic, TypeVar
 
-from pydantic import BaseModel
+from pydantic import BaseModel, model_serializer
 
+T = TypeVar("T")
 
-class NendoHTTPResponse(BaseModel):
-    data: Any
+
+class NendoHTTPResponse(BaseModel, Generic[T]):
+    data: T
     error: Any = None
     has_next: bool = False
     cursor: int = 0
+
+
+class CompactNendoHTTPResponse(NendoHTTPResponse[T], Generic[T]):
+    """NendoHTTPResponse that leaves out the error field when there is none."""
+
+    @model_serializer(mode="wrap")
+    def _drop_empty_error(self, handler):
+        data = handler(self)
+        if data.get("error") is None:
+            data.pop("error", None)
+        return data
@@ -2,17 +2,27 @@
 """Nendo API Server track routes."""
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import os
-from typing import TYPE_CHECKING, List, Optional
+from functools import lru_cache
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple
 
+from api.asset import clear_audio_path_cache
 from api.response import NendoHTTPResponse
 from api.utils import APIRouter
-from auth.auth_users import fastapi_users
+from auth.auth_users import current_user
 from dto.core import TrackSmall
 from fastapi import Body, Depends, HTTPException
-from fastapi.responses import JSONResponse
-from handler.nendo_handler_factory import HandlerType, NendoHandlerFactory
-from pydantic import BaseModel
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
+from handler.nendo_handler_factory import (
+    get_assets_handler,
+    get_collections_handler,
+    get_tracks_handler,
+)
+from pydantic import BaseModel, TypeAdapter
 
 from nendo import NendoLibraryError
 
@@ -20,16 +30,67 @@ from utils import extract_search_filter
 
 if TYPE_CHECKING:
     from auth.auth_db import User
+    from handler.nendo_assets_handler import NendoAssetsHandler
+    from handler.nendo_collections_handler import NendoCollectionsHandler
+    from handler.nendo_tracks_handler import NendoTracksHandler
 
 router = APIRouter()
 
 DEFAULT_PAGE_SIZE = 10
-RESOURCE_TYPES = {
+RESOURCE_TYPES = MappingProxyType({
     "track": "audio",
     "image": "image",
     "text": "text",
     "website": "text",
-}
+})
+
+# validate whole result lists in a single pydantic-core call
+_TRACKS_ADAPTER = TypeAdapter(List[TrackSmall])
+
+
+@lru_cache(maxsize=64)
+def _split_track_type(track_type: Optional[str]) -> Optional[Tuple[str, ...]]:
+    if track_type is None or track_type == "all":
+        return None
+    return tuple(track_type.split(","))
+
+
+def _track_type_list(track_type: Optional[str]) -> Optional[List[str]]:
+    """Turn the comma separated track_type query parameter into a list."""
+    track_types = _split_track_type(track_type)
+    # the library expects a list, and the cached tuple must not be shared
+    return list(track_types) if track_types is not None else None
+
+
+def _drop_nendo_instance(track: Any) -> None:
+    """Detach the nendo instance so the track can be serialized."""
+    if track is None:
+        return
+    try:
+        del track.nendo_instance
+    except AttributeError:
+        pass
+
+
+def _track_file_paths(track: Any, filepath: str) -> List[str]:
+    """Files stored next to a track: its transcoded version and its images."""
+    return [
+        f"{os.path.splitext(filepath)[0]}.mp3",
+        *(os.path.join(image.file_path, image.file_name) for image in track.images),
+    ]
+
+
+def _remove_file(filepath: str) -> None:
+    with contextlib.suppress(FileNotFoundError, IsADirectoryError):
+        os.unlink(filepath)
+
+
+async def _remove_files(file_paths: List[str]) -> None:
+    """Remove the given files concurrently in the threadpool."""
+    await asyncio.gather(
+        *(run_in_threadpool(_remove_file, filepath) for filepath in file_paths),
+    )
+
 
 class TrackObj(BaseModel):
     """Object used when creating NendoTracks."""
@@ -43,13 +104,12 @@ class TrackObj(BaseModel):
 @router.post("/", name="track:create", response_model=NendoHTTPResponse)
 async def create_track(
     track_obj: TrackObj,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    tracks_handler: NendoTracksHandler = Depends(get_tracks_handler),
+    user: User = Depends(current_user),
 ):
-    tracks_handler = handler_factory.create(handler_type=HandlerType.TRACKS)
-
     try:
-        new_track = tracks_handler.create_track(
+        new_track = await run_in_threadpool(
+            tracks_handler.create_track,
             user_id=user.id,
             track_type=track_obj.track_type,
             meta=track_obj.meta,
@@ -58,8 +118,7 @@ async def create_track(
             resource_type=RESOURCE_TYPES[track_obj.track_type],
             # resource_meta={}, #TODO track_obj.resource_meta,
         )
-        if new_track is not None and hasattr(new_track, "nendo_instance"):
-            delattr(new_track, "nendo_instance")
+        _drop_nendo_instance(new_track)
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error creating object: {e}",
@@ -72,13 +131,12 @@ async def create_track(
 async def update_track(
     track_id: str,
     track_obj: TrackObj,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    tracks_handler: NendoTracksHandler = Depends(get_tracks_handler),
+    user: User = Depends(current_user),
 ):
-    tracks_handler = handler_factory.create(handler_type=HandlerType.TRACKS)
-
     try:
-        updated_track = tracks_handler.update_track(
+        updated_track = await run_in_threadpool(
+            tracks_handler.update_track,
             track_id=track_id,
             user_id=user.id,
             track_type=track_obj.track_type,
@@ -87,8 +145,7 @@ async def update_track(
             resource_type=RESOURCE_TYPES[track_obj.track_type],
             resource_meta={},  # TODO track_obj.resource_meta,
         )
-        if updated_track is not None and hasattr(updated_track, "nendo_instance"):
-            delattr(updated_track, "nendo_instance")
+        _drop_nendo_instance(updated_track)
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error creating object: {e}",
@@ -100,20 +157,19 @@ async def update_track(
 @router.get("/{track_id}", name="track:get", response_model=NendoHTTPResponse)
 async def get_track(
     track_id: str,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    tracks_handler: NendoTracksHandler = Depends(get_tracks_handler),
+    user: User = Depends(current_user),
 ):
-    tracks_handler = handler_factory.create(handler_type=HandlerType.TRACKS)
-
     try:
-        track = tracks_handler.get_track(track_id=track_id, user_id=str(user.id))
-        if track is not None and hasattr(track, "nendo_instance"):
-            delattr(track, "nendo_instance")
+        track = await run_in_threadpool(
+            tracks_handler.get_track, track_id=track_id, user_id=str(user.id),
+        )
+        _drop_nendo_instance(track)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
 
     if track is None:
-        return JSONResponse(status_code=404, content={"detail": "Track not found"})
+        return ORJSONResponse(status_code=404, content={"detail": "Track not found"})
 
     return NendoHTTPResponse(data=track, has_next=False, cursor=0)
 
@@ -125,8 +181,8 @@ async def get_tracks(
     search_filter: Optional[str] = None,
     collection_id: Optional[str] = None,
     track_type: Optional[str] = None,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    tracks_handler: NendoTracksHandler = Depends(get_tracks_handler),
+    user: User = Depends(current_user),
 ):
     try:
         search_filters = extract_search_filter(search_filter)
@@ -136,17 +192,13 @@ async def get_tracks(
             detail=f"Invalid search filter: {e}",
         ) from e
 
-    tracks_handler = handler_factory.create(handler_type=HandlerType.TRACKS)
-
     try:
         offset = cursor * limit
-        if track_type is None or track_type == "all":
-            track_type_list = None
-        else:
-            track_type_list = track_type.split(",")
+        track_type_list = _track_type_list(track_type)
         order_by = "collection" if collection_id is not None else "updated_at"
         order = "desc"
-        tracks, num_results = tracks_handler.get_tracks(
+        tracks, num_results = await run_in_threadpool(
+            tracks_handler.get_tracks,
             limit=limit,
             offset=offset,
             filters=search_filters["filters"],
@@ -157,11 +209,7 @@ async def get_tracks(
             order=order,
             user_id=str(user.id),
         )
-        tracks = [TrackSmall.parse_obj(track.dict()) for track in tracks]
-        for track in tracks:
-            for i, pd in enumerate(track.plugin_data):
-                if isinstance(pd.value, str) and len(pd.value) > 2000:
-                    track.plugin_data[i].value = track.plugin_data[i].value[:2000] + " [...]"
+        tracks = _TRACKS_ADAPTER.validate_python(tracks, from_attributes=True)
 
         has_next = len(tracks) == limit
         next_cursor = cursor + 1 if has_next else cursor
@@ -181,8 +229,8 @@ async def get_related_tracks(
     limit: int = DEFAULT_PAGE_SIZE,
     search_filter: Optional[str] = None,
     track_type: Optional[str] = None,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    tracks_handler: NendoTracksHandler = Depends(get_tracks_handler),
+    user: User = Depends(current_user),
 ):
     try:
         search_filters = extract_search_filter(search_filter)
@@ -192,16 +240,13 @@ async def get_related_tracks(
             detail=f"Invalid search filter: {e}",
         ) from e
 
-    tracks_handler = handler_factory.create(handler_type=HandlerType.TRACKS)
     try:
         offset = cursor * limit
-        if track_type is None or track_type == "all":
-            track_type_list = None
-        else:
-            track_type_list = track_type.split(",")
+        track_type_list = _track_type_list(track_type)
         order_by = "updated_at"
         order = "desc"
-        tracks, num_results = tracks_handler.get_related_tracks(
+        tracks, num_results = await run_in_threadpool(
+            tracks_handler.get_related_tracks,
             track_id=track_id,
             limit=limit,
             offset=offset,
@@ -212,11 +257,7 @@ async def get_related_tracks(
             order_by=order_by,
             order=order,
         )
-        tracks = [TrackSmall.parse_obj(track.dict()) for track in tracks]
-        for track in tracks:
-            for i, pd in enumerate(track.plugin_data):
-                if isinstance(pd.value, str) and len(pd.value) > 2000:
-                    track.plugin_data[i].value = track.plugin_data[i].value[:2000] + " [...]"
+        tracks = _TRACKS_ADAPTER.validate_python(tracks, from_attributes=True)
 
         has_next = len(tracks) == limit
         next_cursor = cursor + 1 if has_next else cursor
@@ -238,10 +279,9 @@ async def get_similar_tracks(
     search_filter: Optional[str] = None,
     collection_id: Optional[str] = None,
     track_type: Optional[str] = None,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    tracks_handler: NendoTracksHandler = Depends(get_tracks_handler),
+    user: User = Depends(current_user),
 ):
-    tracks_handler = handler_factory.create(handler_type=HandlerType.TRACKS)
     try:
         search_filters = extract_search_filter(search_filter)
     except Exception as e:
@@ -251,11 +291,9 @@ async def get_similar_tracks(
         ) from e
     try:
         offset = cursor * limit
-        if track_type is None or track_type == "all":
-            track_type_list = None
-        else:
-            track_type_list = track_type.split(",")
-        tracks, num_results = tracks_handler.get_similar_tracks(
+        track_type_list = _track_type_list(track_type)
+        tracks, num_results = await run_in_threadpool(
+            tracks_handler.get_similar_tracks,
             track_id=track_id,
             limit=limit,
             filters=search_filters["filters"],
@@ -265,11 +303,7 @@ async def get_similar_tracks(
             user_id=str(user.id),
             collection_id=collection_id,
         )
-        tracks = [TrackSmall.parse_obj(track.dict()) for track in tracks]
-        for track in tracks:
-            for i, pd in enumerate(track.plugin_data):
-                if isinstance(pd.value, str) and len(pd.value) > 2000:
-                    track.plugin_data[i].value = track.plugin_data[i].value[:2000] + " [...]"
+        tracks = _TRACKS_ADAPTER.validate_python(tracks, from_attributes=True)
 
         has_next = len(tracks) == limit
         next_cursor = cursor + 1 if has_next else cursor
@@ -283,13 +317,11 @@ async def get_similar_tracks(
 
 @router.options("/", name="tracks:options", response_model=NendoHTTPResponse)
 async def get_tracks_options(
-    user: User = Depends(fastapi_users.current_user()),
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
+    user: User = Depends(current_user),
+    tracks_handler: NendoTracksHandler = Depends(get_tracks_handler),
 ):
-    tracks_handler = handler_factory.create(handler_type=HandlerType.TRACKS)
-
     try:
-        options = tracks_handler.get_track_filter_options()
+        options = await run_in_threadpool(tracks_handler.get_track_filter_options)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
     return NendoHTTPResponse(data=options, has_next=False, cursor=0)
@@ -302,60 +334,64 @@ async def get_tracks_options(
 )
 async def delete_selected_tracks(
     selected: List = Body(...),
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    tracks_handler: NendoTracksHandler = Depends(get_tracks_handler),
+    assets_handler: NendoAssetsHandler = Depends(get_assets_handler),
+    collections_handler: NendoCollectionsHandler = Depends(get_collections_handler),
+    user: User = Depends(current_user),
 ):
-    tracks_handler = handler_factory.create(handler_type=HandlerType.TRACKS)
-    assets_handler = handler_factory.create(handler_type=HandlerType.ASSETS)
-    for track_id in selected:
-        filepath = assets_handler.get_audio_path(track_id)
-        track = tracks_handler.get_track(
-            track_id=track_id,
-            user_id=str(user.id)
-        )
-        result = tracks_handler.delete_track(
-            track_id=track_id,
-            user_id=str(user.id),
-        )
-        if not result:
-            raise HTTPException(status_code=404, detail="Unable to delete track")
-        # also delete transcoded version
-        filepath_mp3 = f"{os.path.splitext(filepath)[0]}.mp3"
-        if os.path.isfile(filepath_mp3):
-            os.remove(filepath_mp3)
-
-        # also delete related images
-        for image in track.images:
-            os.remove(os.path.join(image.file_path, image.file_name))
-    return JSONResponse(status_code=200, content={"detail": "Tracks deleted"})
+    user_id = str(user.id)
+    file_paths = []
+    try:
+        for track_id in selected:
+            filepath = await run_in_threadpool(assets_handler.get_audio_path, track_id)
+            track = await run_in_threadpool(
+                tracks_handler.get_track,
+                track_id=track_id,
+                user_id=user_id,
+            )
+            result = await run_in_threadpool(
+                tracks_handler.delete_track,
+                track_id=track_id,
+                user_id=user_id,
+            )
+            if not result:
+                raise HTTPException(status_code=404, detail="Unable to delete track")
+            file_paths.extend(_track_file_paths(track, filepath))
+    finally:
+        await _remove_files(file_paths)
+    clear_audio_path_cache()
+    # collection sizes changed as well
+    collections_handler.invalidate_cache()
+    return ORJSONResponse(status_code=200, content={"detail": "Tracks deleted"})
 
 
 @router.delete("/{track_id}", name="track:delete", status_code=204)
 async def delete_track(
     track_id: str,
-    user: User = Depends(fastapi_users.current_user()),
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
+    user: User = Depends(current_user),
+    tracks_handler: NendoTracksHandler = Depends(get_tracks_handler),
+    assets_handler: NendoAssetsHandler = Depends(get_assets_handler),
+    collections_handler: NendoCollectionsHandler = Depends(get_collections_handler),
 ):
-    tracks_handler = handler_factory.create(handler_type=HandlerType.TRACKS)
-    assets_handler = handler_factory.create(handler_type=HandlerType.ASSETS)
-
-    track = tracks_handler.get_track(track_id=track_id, user_id=str(user.id))
-    filepath = assets_handler.get_audio_path(track_id)
+    user_id = str(user.id)
 
-    result = tracks_handler.delete_track(track_id=track_id, user_id=str(user.id))
+    track = await run_in_threadpool(
+        tracks_handler.get_track, track_id=track_id, user_id=user_id,
+    )
+    filepath = await run_in_threadpool(assets_handler.get_audio_path, track_id)
 
-    # also delete transcoded version
-    filepath_mp3 = f"{os.path.splitext(filepath)[0]}.mp3"
-    if os.path.isfile(filepath_mp3):
-        os.remove(filepath_mp3)
+    result = await run_in_threadpool(
+        tracks_handler.delete_track, track_id=track_id, user_id=user_id,
+    )
 
-    # also delete related images
-    for image in track.images:
-        os.remove(os.path.join(image.file_path, image.file_name))
+    await _remove_files(_track_file_paths(track, filepath))
+    clear_audio_path_cache()
+    # collection sizes changed as well
+    collections_handler.invalidate_cache()
 
     if not result:
         raise HTTPException(status_code=404, detail="Unable to delete track")
-    return JSONResponse(status_code=200, content={"detail": "Track deleted"})
+    return ORJSONResponse(status_code=200, content={"detail": "Track deleted"})
 
 @router.delete(
     "/",
@@ -366,11 +402,11 @@ async def delete_tracks(
     search_filter: Optional[str] = None,
     collection_id: Optional[str] = None,
     track_type: Optional[str] = None,
-    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    tracks_handler: NendoTracksHandler = Depends(get_tracks_handler),
+    collections_handler: NendoCollectionsHandler = Depends(get_collections_handler),
+    user: User = Depends(current_user),
 ):
-    tracks_handler = handler_factory.create(handler_type=HandlerType.TRACKS)
-    assets_handler = handler_factory.create(handler_type=HandlerType.ASSETS)
+    user_id = str(user.id)
     try:
         search_filters = extract_search_filter(search_filter)
     except Exception as e:
@@ -378,35 +414,30 @@ async def delete_tracks(
             status_code=400,
             detail=f"Invalid search filter: {e}",
         ) from e
-    if track_type is None or track_type == "all":
-        track_type_list = None
-    else:
-        track_type_list = track_type.split(",")
-    tracks, _ = tracks_handler.get_tracks(
+    track_type_list = _track_type_list(track_type)
+    tracks, _ = await run_in_threadpool(
+        tracks_handler.get_tracks,
         filters=search_filters["filters"],
         search_meta=search_filters["search_meta"],
         collection_id=collection_id,
         track_type=track_type_list,
-        user_id=str(user.id),
+        user_id=user_id,
     )
-    for track in tracks:
-        filepath = assets_handler.get_audio_path(str(track.id))
-        track = tracks_handler.get_track(
-            track_id=str(track.id),
-            user_id=str(user.id)
-        )
-        result = tracks_handler.delete_track(
-            track_id=str(track.id),
-            user_id=str(user.id),
-        )
-        if not result:
-            raise HTTPException(status_code=404, detail="Unable to delete track")
-        # also delete transcoded version
-        filepath_mp3 = f"{os.path.splitext(filepath)[0]}.mp3"
-        if os.path.isfile(filepath_mp3):
-            os.remove(filepath_mp3)
-
-        # also delete related images
-        for image in track.images:
-            os.remove(os.path.join(image.file_path, image.file_name))
-    return JSONResponse(status_code=200, content={"detail": "Tracks deleted"})
+    # the listed tracks already carry their resource and images,
+    # so they don't need to be fetched again one by one
+    deleted_ids = set(await run_in_threadpool(
+        tracks_handler.delete_tracks,
+        track_ids=[str(track.id) for track in tracks],
+        user_id=user_id,
+    ))
+    await _remove_files([
+        file_path
+        for track in tracks if str(track.id) in deleted_ids
+        for file_path in _track_file_paths(track, track.resource.src)
+    ])
+    clear_audio_path_cache()
+    # collection sizes changed as well
+    collections_handler.invalidate_cache()
+    if len(deleted_ids) < len(tracks):
+        raise HTTPException(status_code=404, detail="Unable to delete track")
+    return ORJSONResponse(status_code=200, content={"detail": "Tracks deleted"})
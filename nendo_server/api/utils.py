@@ -1,16 +1,43 @@
 """Utility functions used by Nendo."""
 import hashlib
-from typing import Any, Callable
+from typing import Any, Callable, Tuple, Type
 
 from fastapi import APIRouter as FastAPIRouter
+from fastapi import HTTPException, Request, Response
+from fastapi.exceptions import ValidationException
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.routing import APIRoute
 from fastapi.types import DecoratedCallable
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.routing import Match
+from starlette.types import Receive, Scope, Send
+
+HASH_BUFFER_SIZE = 1024 * 1024
 
 
 # this APIRouter will allow the calling of paths with or without trailing slash
 # without causing a 307 redirect (which gets stuck with some ingress controllers)
 # e.g. /api/assets AND /api/assets/ will both map to the same route
 # see https://github.com/tiangolo/fastapi/discussions/7298
+# each path is registered once and its route ignores a trailing slash when
+# matching, which keeps the route table (scanned on every request) small
+class TrailingSlashRoute(APIRoute):
+    def matches(self, scope: Scope) -> Tuple[Match, Scope]:
+        path = scope["path"]
+        if len(path) > 1 and path.endswith("/"):
+            scope = {**scope, "path": path[:-1]}
+        return super().matches(scope)
+
+
 class APIRouter(FastAPIRouter):
+    def __init__(
+        self,
+        *args: Any,
+        route_class: Type[APIRoute] = TrailingSlashRoute,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, route_class=route_class, **kwargs)
+
     def api_route(
         self,
         path: str,
@@ -21,39 +48,70 @@ class APIRouter(FastAPIRouter):
         if path.endswith("/"):
             path = path[:-1]
 
-        add_path = super().api_route(
+        return super().api_route(
             path,
             include_in_schema=include_in_schema,
             **kwargs,
         )
 
-        alternate_path = path + "/"
-        add_alternate_path = super().api_route(
-            alternate_path,
-            include_in_schema=False,
-            **kwargs,
-        )
 
-        def decorator(func: DecoratedCallable) -> DecoratedCallable:
-            add_alternate_path(func)
-            return add_path(func)
+# routes using this class don't need to wrap their handler calls in try/except:
+# any unexpected error is logged and answered with a 500 "Nendo error" response
+# use it via APIRouter(route_class=NendoErrorRoute)
+class NendoErrorRoute(TrailingSlashRoute):
+    def get_route_handler(self) -> Callable:
+        route_handler = super().get_route_handler()
 
-        return decorator
+        async def nendo_error_route_handler(request: Request) -> Response:
+            try:
+                return await route_handler(request)
+            except (StarletteHTTPException, ValidationException):
+                raise
+            except Exception as e:
+                request.app.state.logger.exception(f"Nendo error: {e}")
+                raise HTTPException(
+                    status_code=500, detail=f"Nendo error: {e}",
+                ) from e
+
+        return nendo_error_route_handler
+
+
+# binary responses (audio, images, zip archives) are already compressed
+# and may be served as byte ranges, so they must not be gzipped
+UNCOMPRESSED_PATH_PARTS = ("/assets/", "/audio/")
+
+
+class JSONGZipMiddleware(GZipMiddleware):
+    """GZip middleware that leaves binary asset responses untouched."""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and any(
+            part in scope["path"] for part in UNCOMPRESSED_PATH_PARTS
+        ):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
 
 
 def md5sum(file_path):
     """Compute md5 checksum of file found under the given file_path."""
-    hash_md5 = hashlib.md5()  # noqa: S324
     with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_md5.update(chunk)
+        if hasattr(hashlib, "file_digest"):  # python >= 3.11
+            return hashlib.file_digest(f, "md5").hexdigest()
+        hash_md5 = hashlib.md5()  # noqa: S324
+        buffer = memoryview(bytearray(HASH_BUFFER_SIZE))
+        while n := f.readinto(buffer):
+            hash_md5.update(buffer[:n])
     return hash_md5.hexdigest()
 
 
+SUPPORTED_AUDIO_FILETYPES = frozenset({"wav", "mp3", "aiff", "flac", "ogg", "m4a"})
+
+
 class AudioFileUtils:
     """Utility class for handling audio files."""
 
-    def is_supported_filetype(self, filepath):
+    @staticmethod
+    def is_supported_filetype(filepath):
         """Check if the filetype of the file given as filepath is supported."""
-        supported_filetypes = ["wav", "mp3", "aiff", "flac", "ogg", "m4a"]
-        return filepath.lower().split(".")[-1] in supported_filetypes
+        return filepath.rpartition(".")[2].lower() in SUPPORTED_AUDIO_FILETYPES
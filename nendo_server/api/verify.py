@@ -1,6 +1,6 @@
 # -*- encoding: utf-8 -*-
 """Verification routes."""
-import json
+from typing import Optional
 
 import httpx
 from api.response import NendoHTTPResponse
@@ -9,6 +9,32 @@ from fastapi import APIRouter, HTTPException
 
 router = APIRouter()
 
+# shared client, so verifications reuse keep-alive connections
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client, creating it on first use."""
+    global _client  # noqa: PLW0603
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0),
+            limits=httpx.Limits(
+                max_connections=100,
+                max_keepalive_connections=20,
+                keepalive_expiry=300,
+            ),
+        )
+    return _client
+
+
+@router.on_event("shutdown")
+async def close_client():
+    global _client  # noqa: PLW0603
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
 
 @router.get("/{token}", name="verify email")
 async def verify_email(token: str):
@@ -17,11 +43,7 @@ async def verify_email(token: str):
 
     try:
         url = settings.email_verify_url_internal
-        payload = json.dumps({"token": token})
-        headers = {"Content-Type": "application/json"}
-
-        async with httpx.AsyncClient() as client:
-            await client.post(url, headers=headers, data=payload)
+        await get_client().post(url, json={"token": token})
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Nendo error: {e}") from e
@@ -2,13 +2,47 @@
 """Actions for running Polymath."""
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
 import redis
 import requests
 from bs4 import BeautifulSoup
 from nendo import Nendo, NendoTrack
 from readability import Document
+from requests.adapters import HTTPAdapter
 from rq.job import Job
+from urllib3 import exceptions as urllib3_exceptions
+from urllib3.util.retry import Retry
+
+# one session for all crawled pages, so connections to a host are reused
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": "nendo-getpage/0.1.0"})
+_ADAPTER = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3),
+)
+SESSION.mount("http://", _ADAPTER)
+SESSION.mount("https://", _ADAPTER)
+CRAWL_CONCURRENCY = 10
+# upper bound for the (decompressed) HTML read from a single page
+MAX_PAGE_BYTES = 2_000_000
+
+
+def fetch_page(url: str) -> Optional[str]:
+    """Download the HTML of a single page, capped at MAX_PAGE_BYTES.
+
+    Returns None if the page could not be fetched, so that one unreachable
+    page doesn't abort the whole crawl.
+    """
+    try:
+        with SESSION.get(url, stream=True, timeout=(5, 30)) as response:
+            raw = response.raw.read(MAX_PAGE_BYTES, decode_content=True)
+            return raw.decode(response.encoding or "utf-8", errors="replace")
+    # reading the raw stream raises urllib3's errors, not requests' wrappers
+    except (requests.RequestException, urllib3_exceptions.HTTPError):
+        return None
 
 
 def getpage(
@@ -22,20 +56,42 @@ def getpage(
         db=0,
     )
     job = Job.fetch(job_id, connection=redis_conn)
+    job.meta["errors"] = []
     nd = Nendo()
     track_or_collection = nd.get_track_or_collection(target_id)
-    if type(track_or_collection) == NendoTrack:
+    if isinstance(track_or_collection, NendoTrack):
         tracks = [track_or_collection]
     else:
         tracks = track_or_collection.tracks()
     num_tracks = len(tracks)
     templates = nd.plugins.textgen.templates()
-    for i, track in enumerate(tracks):
-        job.meta["progress"] = f"Crawling website {i+1}/{num_tracks}"
+    job.meta["progress"] = f"Crawling {num_tracks} websites"
+    job.save_meta()
+    # fetch all pages concurrently, the processing below is sequential anyway
+    try:
+        with ThreadPoolExecutor(max_workers=CRAWL_CONCURRENCY) as executor:
+            pages = list(executor.map(
+                fetch_page, [track.get_meta("url") for track in tracks],
+            ))
+    finally:
+        SESSION.close()
+    fetched_tracks = []
+    for track, page in zip(tracks, pages):
+        if page is None:
+            job.meta["errors"].append(
+                f"Failed to fetch {track.get_meta('url')} for track {track.id}",
+            )
+        else:
+            fetched_tracks.append((track, page))
+    tracks = [track for track, _ in fetched_tracks]
+    num_tracks = len(tracks)
+    if num_tracks == 0:
         job.save_meta()
-        response = requests.get(track.get_meta("url"))  # noqa: S113
-        doc = Document(response.text)
-        soup = BeautifulSoup(doc.summary(), "html.parser")
+        return
+    bodies = []
+    for track, page in fetched_tracks:
+        doc = Document(page)
+        soup = BeautifulSoup(doc.summary(), "lxml")
         body = soup.get_text()
         track.add_plugin_data(
             plugin_name="getpage_app",
@@ -43,19 +99,25 @@ def getpage(
             key="body",
             value=body,
         )
-        job.meta["progress"] = f"Summarizing website {i+1}/{num_tracks}"
-        job.save_meta()
-        result = nd.plugins.textgen(
-            prompts=[body],
-            system_prompts=[templates.SUMMARIZATION],
-        )
-        summary = result[0]
+        bodies.append(body)
+    job.meta["progress"] = f"Summarizing {num_tracks} websites"
+    job.save_meta()
+    # summarize all pages in one batched call
+    summaries = nd.plugins.textgen(
+        prompts=bodies,
+        system_prompts=[templates.SUMMARIZATION] * num_tracks,
+    )
+    for track, summary in zip(tracks, summaries):
         track.add_plugin_data(
             plugin_name="nendo_plugin_textgen",
             key="summary",
             value=summary,
         )
-        job.meta["progress"] = f"Embedding website {i+1}/{num_tracks}"
+    # embed only once all summaries are stored, so the embedding model runs
+    # back to back without interleaved library writes
+    job.meta["progress"] = f"Embedding {num_tracks} websites"
+    job.save_meta()
+    for track in tracks:
         nd.library.embed_track(track)
     nd.logger.info(target_id)
 
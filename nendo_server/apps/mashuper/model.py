@@ -3,7 +3,7 @@
 import uuid
 from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from sqlalchemy import Column, Integer, MetaData, String
 from sqlalchemy.dialects.postgresql import JSON, UUID
 from sqlalchemy.orm import declarative_base
@@ -31,6 +31,8 @@ class Settings(BaseModel):
 
 
 class Channel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: str
     name: str
     type: Type
@@ -41,6 +43,8 @@ class Channel(BaseModel):
 
 
 class Scene(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: Optional[int] = None
     user_id: uuid.UUID
     name: str
@@ -5,7 +5,20 @@
 import argparse
 import librosa
 
-from nendo import Nendo
+from nendo import Nendo, NendoTrack
+
+
+def _copy_classify_meta(src_track: NendoTrack, dst_track: NendoTrack) -> None:
+    """Copy the classification plugin data from one track to another."""
+    for pd in src_track.get_plugin_data(plugin_name="nendo_plugin_classify_core"):
+        # don't copy tempo (has been changed by quantization)
+        if pd.key != "tempo":
+            dst_track.add_plugin_data(
+                plugin_name=pd.plugin_name,
+                plugin_version=pd.plugin_version,
+                key=pd.key,
+                value=pd.value,
+            )
 
 
 def quantize(
@@ -31,15 +44,7 @@ def quantize(
                 "duration": duration,
             }
         )
-    for pd in track.get_plugin_data(plugin_name="nendo_plugin_classify_core"):
-        # don't copy tempo (has been changed by quantization)
-        if pd.key != "tempo":
-            q_track.add_plugin_data(
-                plugin_name=pd.plugin_name,
-                plugin_version=pd.plugin_version,
-                key=pd.key,
-                value=pd.value,
-            )
+    _copy_classify_meta(track, q_track)
     if target_collection.collection_type == "temp":
         nd.library.remove_collection(
             collection_id=target_collection.id,
@@ -1,28 +1,69 @@
 # -*- encoding: utf-8 -*-
 """Routes used by the Mashuper app."""
-import json
+import os
 import re
 import urllib.parse
-from pathlib import Path
-from typing import Dict, Optional
+import uuid
+from typing import Dict, List, Optional
 
+import anyio
+from api.asset import cached_audio_file, evict_audio_file
 from auth.auth_db import User
-from auth.auth_users import fastapi_users
+from auth.auth_users import current_user
 from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from handler.nendo_handler_factory import HandlerType, NendoHandlerFactory
-from sqlalchemy import and_
+from pydantic import TypeAdapter
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .model import Channel, Scene, SceneDB
+from .model import Scene, SceneDB
 
 router = APIRouter()
 
+_SCENES_ADAPTER = TypeAdapter(List[Scene])
+# read size for streaming audio byte ranges
+AUDIO_CHUNK_SIZE = 64 * 1024
+# "start-end" or "start-", optionally in HTTP Range header form "bytes=start-end"
+_RANGE_RE = re.compile(r"^(?:bytes=)?(\d+)-(\d*)$")
+
+
+def _tempo(track) -> int:
+    """Get a track's tempo from its already loaded plugin data.
+
+    Avoids a plugin data query per track when checking many related tracks.
+    """
+    for pd in track.plugin_data:
+        if pd.key == "tempo":
+            return int(float(pd.value))
+    return 0
+
+
+async def _get_user_scene(
+    session: AsyncSession, scene_id: int, user_id: uuid.UUID,
+) -> Optional[SceneDB]:
+    """Get one of the user's scenes, or None if it doesn't exist."""
+    result = await session.execute(
+        select(SceneDB).where(
+            and_(
+                SceneDB.id == scene_id,
+                SceneDB.user_id == user_id,
+            ),
+        ),
+    )
+    return result.scalar_one_or_none()
+
+
+def _track_title(track) -> str:
+    return track.get_meta("title") or track.resource.meta["original_filename"]
+
 
 @router.post("/scenes")
 async def create_scene(
     request: Request,
     scene: Dict = Body(...),
-    user: User = Depends(fastapi_users.current_user()),
+    user: User = Depends(current_user),
 ):
     """Create a new scene."""
     try:
@@ -30,12 +71,12 @@ async def create_scene(
         scene_obj = Scene(**scene)
         scene_id = 0
         # Add and commit the new scene to the database
-        with request.app.state.db.session_scope() as session:
+        async with request.app.state.db.async_session_scope() as session:
             # Convert the Pydantic model to a dict, then to a SceneDB SQLAlchemy object
             scene_model = SceneDB(**scene_obj.dict())
             session.add(scene_model)
-            session.commit()
-            session.refresh(scene_model)
+            await session.commit()
+            await session.refresh(scene_model)
             scene_id = scene_model.id
 
         return {"scene_id": scene_id}
@@ -48,23 +89,14 @@ async def update_scene(
     request: Request,
     scene_id: int,
     scene: Dict = Body(...),
-    user: User = Depends(fastapi_users.current_user()),
+    user: User = Depends(current_user),
 ):
     """Update an existing scene."""
     try:
         scene.update({"user_id": user.id})
         scene_obj = Scene(**scene)
-        with request.app.state.db.session_scope() as session:
-            scene_db = (
-                session.query(SceneDB)
-                .filter(
-                    and_(
-                        SceneDB.id == scene_id,
-                        SceneDB.user_id == user.id,
-                    ),
-                )
-                .first()
-            )
+        async with request.app.state.db.async_session_scope() as session:
+            scene_db = await _get_user_scene(session, scene_id, user.id)
             if scene_db is None:
                 raise HTTPException(status_code=404, detail="Scene not found")
             scene_model = SceneDB(**scene_obj.dict())
@@ -72,7 +104,7 @@ async def update_scene(
             scene_db.author = scene_model.author
             scene_db.channels = scene_model.channels
             scene_db.tempo = scene_model.tempo
-            session.commit()
+            await session.commit()
 
         return {"message": f"Scene {scene_id} has been updated."}
     except Exception as e:
@@ -82,74 +114,51 @@ async def update_scene(
 async def get_scene(
     request: Request,
     scene_id: int,
-    user: User = Depends(fastapi_users.current_user()),
+    user: User = Depends(current_user),
 ):
     """Get a scene from the DB."""
     # Query the database for the scene
-    with request.app.state.db.session_scope() as session:
-        scene_model = (
-            session.query(SceneDB)
-            .filter(
-                and_(
-                    SceneDB.id == scene_id,
-                    SceneDB.user_id == user.id,
-                ),
-            )
-            .first()
-        )
+    async with request.app.state.db.async_session_scope() as session:
+        scene_model = await _get_user_scene(session, scene_id, user.id)
 
         if scene_model is None:
             raise HTTPException(status_code=404, detail="Scene not found")
 
-        # Deserialize the JSON field 'channels' in the scene
-        # and create a Pydantic Scene object for the response
-        scene_data = scene_model.__dict__
-        scene_data["channels"] = Channel.model_validate(
-            json.dumps(scene_data["channels"]),
-        )
-
-        return Scene(**scene_data)
+        # the JSON column 'channels' is already deserialized by SQLAlchemy
+        return Scene.model_validate(scene_model)
 
 
 @router.get("/scenes")
 async def get_scenes(
     request: Request,
-    user: User = Depends(fastapi_users.current_user()),
+    user: User = Depends(current_user),
 ):
-    with request.app.state.db.session_scope() as session:
+    async with request.app.state.db.async_session_scope() as session:
         # Query from database
-        result = session.query(SceneDB).filter(SceneDB.user_id == user.id).all()
+        result = await session.execute(
+            select(SceneDB).where(SceneDB.user_id == user.id),
+        )
 
-        # Deserialize JSON to Scene object and add to list
-        return [Scene.model_validate(r.__dict__) for r in result]
+        return _SCENES_ADAPTER.validate_python(result.scalars().all())
 
 
 @router.delete("/scenes/{scene_id}")
 async def delete_scene(
     request: Request,
     scene_id: int,
-    user: User = Depends(fastapi_users.current_user()),
+    user: User = Depends(current_user),
 ):
     """Delete a scene."""
     # Query the database for the scene
-    with request.app.state.db.session_scope() as session:
-        scene_model = (
-            session.query(SceneDB)
-            .filter(
-                and_(
-                    SceneDB.id == scene_id,
-                    SceneDB.user_id == user.id,
-                ),
-            )
-            .first()
-        )
+    async with request.app.state.db.async_session_scope() as session:
+        scene_model = await _get_user_scene(session, scene_id, user.id)
 
         if scene_model is None:
             raise HTTPException(status_code=404, detail="Scene not found")
 
         # Delete the scene from the database
-        session.delete(scene_model)
-        session.commit()
+        await session.delete(scene_model)
+        await session.commit()
 
     return {"message": f"Scene {scene_id} has been deleted."}
 
@@ -164,7 +173,7 @@ async def get_random_file(
     duration_max: Optional[float] = Query(None),
     collection_id: Optional[str] = Query(None),
     handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    user: User = Depends(current_user),
 ):
     filter_list = filters.split(",") if filters else None
     song_bpm = int(songbpm) if songbpm else None
@@ -191,22 +200,12 @@ async def get_random_file(
         track_title = track.get_meta("title")
 
         # check if track already has the right bpm
-        track_tempo = track.get_plugin_value(
-            key="tempo",
-            user_id=str(user.id),
-        )
-        track_tempo = int(float(track_tempo)) if track_tempo is not None else 0
-        if track_tempo == song_bpm:
+        if _tempo(track) == song_bpm:
             return {"track_title": track_title, "track_id": str(track.id)}
         # check if track has already been quantized to the right bpm
         related_tracks = track.get_related_tracks(user_id=str(user.id))
         for rt in related_tracks:
-            rt_tempo = rt.get_plugin_value(
-                key="tempo",
-                user_id=str(user.id),
-            )
-            rt_tempo = int(float(rt_tempo)) if rt_tempo is not None else 0
-            if rt_tempo == song_bpm:
+            if _tempo(rt) == song_bpm:
                 return {"track_title": rt.get_meta("title"), "track_id": str(rt.id)}
 
         # enqueue quantization job
@@ -251,33 +250,68 @@ async def stream_audio(
     track_id: str,
     range: Optional[str] = Query(None),
 ):
-    track = request.app.state.nendo_instance.get_track(track_id=track_id)
-    if track is None:
+    audio_file = await run_in_threadpool(
+        cached_audio_file, request.app.state.nendo_instance, track_id,
+    )
+    if audio_file is None:
         raise HTTPException(status_code=404, detail="Track not found.")
 
-    filepath = track.resource.src
-
-    file_size = Path(filepath).stat().st_size
-    start, end = 0, file_size - 1
-    if range is not None:
-        match = re.search(r"(\d+)-(\d*)", range)
-        start, end = [
-            int(g) if g else start if idx == 0 else end
-            for idx, g in enumerate(match.groups())
-        ]
-
-    def content():
-        with open(filepath, "rb") as file:
-            file.seek(start)
-            yield file.read(end - start + 1)
+    filepath, file_name = audio_file
+    try:
+        stat_result = await run_in_threadpool(os.stat, filepath)
+    except FileNotFoundError as e:
+        # the track was deleted, possibly by another worker process
+        evict_audio_file(track_id)
+        raise HTTPException(status_code=404, detail="Track not found.") from e
+    file_size = stat_result.st_size
+    headers = {
+        "Content-Disposition": (
+            f'inline; filename="{urllib.parse.quote(file_name)}"'
+        ),
+    }
+    if range is None:
+        # whole file, served with sendfile where available
+        headers["Content-Range"] = f"bytes 0-{file_size - 1}/{file_size}"
+        return FileResponse(
+            filepath,
+            headers=headers,
+            media_type="audio/x-wav",
+            stat_result=stat_result,
+        )
 
-    response = StreamingResponse(content(), media_type="audio/x-wav")
-    response.headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
-    response.headers[
-        "Content-Disposition"
-    ] = f'inline; filename="{urllib.parse.quote(track.resource.file_name)}"'
+    match = _RANGE_RE.match(range.strip())
+    if match is None:
+        raise HTTPException(status_code=416, detail="Invalid range.")
+    start = int(match.group(1))
+    # an open or overlong end means "up to the end of the file"
+    end = min(int(match.group(2) or file_size - 1), file_size - 1)
+    if start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Range not satisfiable.",
+            headers={"Content-Range": f"bytes */{file_size}"},
+        )
 
-    return response
+    # open the file before any headers are sent, so a deleted track is a 404
+    try:
+        audio = await anyio.open_file(filepath, "rb")
+    except FileNotFoundError as e:
+        evict_audio_file(track_id)
+        raise HTTPException(status_code=404, detail="Track not found.") from e
+
+    async def content():
+        async with audio as file:
+            await file.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await file.read(min(AUDIO_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    return StreamingResponse(content(), headers=headers, media_type="audio/x-wav")
 
 
 @router.get("/quantize/{track_id}")
@@ -286,7 +320,7 @@ async def get_quantized(
     track_id: str,
     songbpm: int,
     handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    user: User = Depends(current_user),
 ):
     """Route used to quantize a target track."""
     target_track = request.app.state.nendo_instance.library.get_track(
@@ -296,17 +330,9 @@ async def get_quantized(
     if target_track is None:
         raise HTTPException(status_code=404, detail="Track not found.")
     # check if track already has the right bpm
-    track_tempo = target_track.get_plugin_value(
-        key="tempo",
-        user_id=str(user.id),
-    )
-    track_tempo = int(float(track_tempo)) if track_tempo is not None else 0
-    if track_tempo == songbpm:
+    if _tempo(target_track) == songbpm:
         return {
-            "track_title": (
-                target_track.get_meta("title") or
-                target_track.resource.meta["original_filename"]
-            ),
+            "track_title": _track_title(target_track),
             "track_id": str(target_track.id),
         }
 
@@ -316,35 +342,16 @@ async def get_quantized(
             direction="from", user_id=str(user.id),
         )
         for rt in related_tracks:
-            track_tempo = rt.get_plugin_value(
-                key="tempo",
-                user_id=str(user.id),
-            )
-            track_tempo = int(float(track_tempo)) if track_tempo is not None else 0
-            if track_tempo == songbpm:
-                return {
-                    "track_title": (
-                        rt.get_meta("title") or
-                        rt.resource.meta["original_filename"]
-                    ),
-                    "track_id": str(rt.id),
-                }
+            if _tempo(rt) == songbpm:
+                return {"track_title": _track_title(rt), "track_id": str(rt.id)}
             if rt.track_type == "loop":
                 rrts = rt.get_related_tracks(
                     direction="to", user_id=str(user.id),
                 )
                 for rrt in rrts:
-                    track_tempo = rrt.get_plugin_value(
-                        key="tempo",
-                        user_id=str(user.id),
-                    )
-                    track_tempo = int(float(track_tempo)) if track_tempo is not None else 0
-                    if track_tempo == songbpm:
+                    if _tempo(rrt) == songbpm:
                         return {
-                            "track_title": (
-                                rrt.get_meta("title") or
-                                rrt.resource.meta["original_filename"]
-                            ),
+                            "track_title": _track_title(rrt),
                             "track_id": str(rrt.id),
                         }
                 target_track = rt
@@ -382,10 +389,7 @@ async def get_quantized(
     return JSONResponse(
         status_code=200,
         content={
-            "track_title": (
-                target_track.get_meta("title") or
-                target_track.resource.meta["original_filename"]
-            ),
+            "track_title": _track_title(target_track),
             "task_id": action_id,
         },
     )
@@ -4,6 +4,7 @@
 import argparse
 import gc
 import os
+from functools import lru_cache
 from typing import Any, Callable
 
 import redis
@@ -14,6 +15,12 @@ from rq.job import Job
 from wrapt_timeout_decorator import timeout
 
 
+@lru_cache(maxsize=1)
+def get_nendo() -> Nendo:
+    """Get the process-wide Nendo instance, creating it on first use."""
+    return Nendo()
+
+
 def restrict_tf_memory():
     import tensorflow as tf
     gpus = tf.config.list_physical_devices("GPU")
@@ -62,7 +69,7 @@ def main():
 
     args = parser.parse_args()
     restrict_tf_memory()
-    nd = Nendo()
+    nd = get_nendo()
     redis_conn = redis.Redis(
         host="redis",
         port=6379,
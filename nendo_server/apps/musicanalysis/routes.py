@@ -3,7 +3,7 @@
 from typing import Dict, Optional
 
 from auth.auth_db import User
-from auth.auth_users import fastapi_users
+from auth.auth_users import current_user
 from fastapi import APIRouter, Body, Depends, HTTPException, Query
 from fastapi.responses import JSONResponse
 from handler.nendo_handler_factory import HandlerType, NendoHandlerFactory
@@ -18,7 +18,7 @@ async def run_musicanalysis(
     add_to_collection_id: str = Query(""),
     params: Dict = Body(...),
     handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
-    user: User = Depends(fastapi_users.current_user()),
+    user: User = Depends(current_user),
 ):
     """Process a track with musicanalysis."""
     actions_handler = handler_factory.create(handler_type=HandlerType.ACTIONS)
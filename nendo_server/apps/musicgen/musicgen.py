@@ -1,32 +1,159 @@
 # -*- encoding: utf-8 -*-
 """Musicgeneration app."""
-# ruff: noqa: BLE001, T201, I001
+# ruff: noqa: BLE001, T201, I001, E402
 import argparse
 import gc
 from pathlib import Path
 import os
+import time
 import uuid
-from typing import Any
+from functools import lru_cache
+from typing import Any, List, Optional
+
+# let the CUDA caching allocator grow segments instead of fragmenting,
+# this has to be set before torch initializes CUDA
+os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True")
 
 import librosa
-import matplotlib.pyplot as plt
+import matplotlib
 import numpy as np
 import redis
 import torch
 from nendo import Nendo
 from nendo import NendoTrack, NendoResource
+from PIL import Image
 from rq.job import Job
 
 
-def free_memory(to_delete: Any):
+@lru_cache(maxsize=1)
+def get_nendo() -> Nendo:
+    """Get the process-wide Nendo instance, creating it on first use."""
+    return Nendo()
+
+
+# flushing the CUDA caching allocator forces a full device sync and makes the
+# next stage cudaMalloc again, so only do it when asked to (e.g. on small GPUs)
+EMPTY_CACHE = os.environ.get("NENDO_EMPTY_CACHE", "0") == "1"
+
+
+def release_plugin(to_delete: Any):
     del to_delete
     gc.collect()
-    torch.cuda.empty_cache()
-    torch.cuda.ipc_collect()
+    if EMPTY_CACHE:
+        torch.cuda.empty_cache()
+        torch.cuda.ipc_collect()
+
+
+# same size and colormap as the axis-less 10x4 inch specshow figure it replaces
+SPECTROGRAM_IMAGE_SIZE = (1000, 400)
+SPECTROGRAM_LUT = (
+    matplotlib.colormaps["magma"](np.linspace(0, 1, 256))[:, :3] * 255
+).astype(np.uint8)
+
+
+def save_spectrogram_image(log_mel_spect: np.ndarray, image_file_path: str):
+    """Colormap a (log) spectrogram and save it as an image, without a figure."""
+    low, high = log_mel_spect.min(), log_mel_spect.max()
+    scaled = (log_mel_spect - low) / max(high - low, 1e-9)
+    rgb = SPECTROGRAM_LUT[(scaled * 255).astype(np.uint8)]
+    # low frequencies go to the bottom of the image
+    image = Image.fromarray(np.ascontiguousarray(rgb[::-1]))
+    # the image is decorative, favor encoding speed over file size
+    image.resize(SPECTROGRAM_IMAGE_SIZE).save(image_file_path, compress_level=1)
+
+
+# librosa.feature.melspectrogram defaults
+MEL_N_FFT = 2048
+MEL_HOP_LENGTH = 512
+MEL_N_BANDS = 256
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+
+
+@lru_cache(maxsize=8)
+def mel_filterbank(sr: int) -> torch.Tensor:
+    """Get the mel filterbank for a sample rate, resident on the device."""
+    mel_basis = librosa.filters.mel(sr=sr, n_fft=MEL_N_FFT, n_mels=MEL_N_BANDS)
+    return torch.from_numpy(mel_basis).to(DEVICE)
+
+
+@lru_cache(maxsize=1)
+def stft_window() -> torch.Tensor:
+    return torch.hann_window(MEL_N_FFT, device=DEVICE)
+
 
+# musicgen models generate audio at 32kHz
+MUSICGEN_SAMPLE_RATE = 32000
 
-def finish_track(track: NendoTrack, add_to_collection_id: str):
-    nd = Nendo()
+
+def warmup_allocator(duration: int):
+    """Reserve the largest audio buffer up front, so the caching allocator
+    creates its biggest block first and reuses it across all samples.
+    """
+    if DEVICE != "cuda":
+        return
+    max_len = int(2 * duration * MUSICGEN_SAMPLE_RATE)
+    buffer = torch.empty(max_len, device=DEVICE, dtype=torch.float16)
+    del buffer
+
+
+def log_mel_spectrograms(ys: List[np.ndarray], sr: int) -> List[np.ndarray]:
+    """Compute the log-mel spectrograms of mono signals in one batch on the GPU.
+
+    Equivalent to ``librosa.power_to_db(librosa.feature.melspectrogram(...),
+    ref=np.max)`` per signal, but runs the STFT and the mel projection with
+    torch on all signals at once.
+    """
+    lengths = [len(y) for y in ys]
+    # zero padding is what the centered STFT pads with anyway,
+    # so the frames of shorter signals are unaffected
+    batch = np.zeros((len(ys), max(lengths)), dtype=np.float32)
+    for i, y in enumerate(ys):
+        batch[i, :len(y)] = y
+    with torch.inference_mode():
+        wav = torch.from_numpy(batch).to(DEVICE)
+        spec = torch.stft(
+            wav,
+            n_fft=MEL_N_FFT,
+            hop_length=MEL_HOP_LENGTH,
+            window=stft_window(),
+            center=True,
+            pad_mode="constant",
+            return_complex=True,
+        ).abs().pow_(2)
+        mel = mel_filterbank(sr) @ spec
+        log_mel = 10 * torch.log10(mel.clamp_min(1e-10))
+        log_mels = log_mel.cpu().numpy()
+    results = []
+    for log_mel_spect, length in zip(log_mels, lengths):
+        log_mel_spect = log_mel_spect[:, :1 + length // MEL_HOP_LENGTH]
+        log_mel_spect -= log_mel_spect.max()
+        results.append(np.maximum(log_mel_spect, -80.0))
+    return results
+
+
+# minimum time between two progress writes to redis
+PROGRESS_INTERVAL = 0.25
+_last_save = 0.0
+
+
+def save_progress(job: Job, progress: str):
+    """Set the job's progress, writing it to redis at most every 250ms."""
+    global _last_save  # noqa: PLW0603
+    job.meta["progress"] = progress
+    now = time.monotonic()
+    if now - _last_save > PROGRESS_INTERVAL:
+        job.save_meta()
+        _last_save = now
+
+
+def finish_track(
+    track: NendoTrack,
+    add_to_collection_id: str,
+    y: Optional[np.ndarray] = None,
+    sr: Optional[int] = None,
+    log_mel_spect: Optional[np.ndarray] = None,
+):
+    nd = get_nendo()
     if add_to_collection_id is not None and len(add_to_collection_id) > 0:
         nd.add_track_to_collection(
             track_id=track.id,
@@ -34,21 +161,17 @@ def finish_track(track: NendoTrack, add_to_collection_id: str):
         )
     # compute spectrogram
     # TODO turn into a plugin
-    y, sr = librosa.load(track.resource.src, sr=None)
-    mel_spect = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=256)
-    log_mel_spect = librosa.power_to_db(mel_spect, ref=np.max)
-    plt.figure(figsize=(10, 4))
-    librosa.display.specshow(log_mel_spect, sr=sr, x_axis="time", y_axis="mel")
-    plt.axis("off")
-    plt.xticks([]), plt.yticks([])
-    plt.subplots_adjust(left=0, right=1, top=1, bottom=0)
+    if log_mel_spect is None:
+        # only decode the file again if the caller doesn't have the signal at hand
+        if y is None:
+            y, sr = librosa.load(track.resource.src, sr=None)
+        log_mel_spect = log_mel_spectrograms([y], sr)[0]
     image_file_path = os.path.join(
         nd.config.library_path,
         "images/",
         f"{uuid.uuid4()}.png",
     )
-    plt.savefig(image_file_path, bbox_inches="tight", pad_inches=0)
-    plt.close()
+    save_spectrogram_image(log_mel_spect, image_file_path)
     image_resource = NendoResource(
         file_path=os.path.dirname(image_file_path),
         file_name=os.path.basename(image_file_path),
@@ -83,7 +206,7 @@ def main():
     parser.add_argument("--seed", type=int, required=False, default=-1)
 
     args = parser.parse_args()
-    nd = Nendo()
+    nd = get_nendo()
     redis_conn = redis.Redis(
         host="redis",
         port=6379,
@@ -108,6 +231,7 @@ def main():
     else:
         model_path = args.model
 
+    warmup_allocator(args.duration)
     generations = nd.plugins.musicgen(
         n_samples=args.n_samples,
         prompt=args.prompt,
@@ -120,7 +244,7 @@ def main():
         cfg_coef=args.cfg_coef,
         seed=args.seed,
     )
-    free_memory(nd.plugins.musicgen.plugin_instance)
+    release_plugin(nd.plugins.musicgen.plugin_instance)
 
     collection_id = args.add_to_collection_id
     if collection_id is None:
@@ -131,13 +255,23 @@ def main():
         )
         collection_id = tmp_coll.id
 
-    for i, track in enumerate(generations):
-        job.meta["progress"] = f"Post-processing generated Track {i + 1}/{len(generations)}"
-        job.save_meta()
+    # the generated signals are still in memory, compute all spectrograms at once
+    log_mel_spects = []
+    if generations:
+        log_mel_spects = log_mel_spectrograms(
+            [librosa.to_mono(track.signal) for track in generations],
+            generations[0].sr,
+        )
+
+    for i, (track, log_mel_spect) in enumerate(zip(generations, log_mel_spects)):
+        save_progress(
+            job, f"Post-processing generated Track {i + 1}/{len(generations)}",
+        )
         track.set_meta({
             "title": f"{args.prompt} - {i+1}",
         })
-        finish_track(track, collection_id)
+        finish_track(track, collection_id, log_mel_spect=log_mel_spect)
+    job.save_meta()
 
     if args.add_to_collection_id is not None and len(args.add_to_collection_id) > 0:
         print("collection/" + args.add_to_collection_id)
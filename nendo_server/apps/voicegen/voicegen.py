@@ -9,12 +9,13 @@ import sys
 from typing import Any
 
 import librosa
-import matplotlib.pyplot as plt
+import matplotlib
 import numpy as np
 import redis
 import torch
 from nendo import Nendo
 from nendo import NendoTrack, NendoResource
+from PIL import Image
 from rq.job import Job
 
 
@@ -25,6 +26,23 @@ def free_memory(to_delete: Any):
     torch.cuda.ipc_collect()
 
 
+SPECTROGRAM_IMAGE_SIZE = (1000, 400)
+SPECTROGRAM_LUT = (
+    matplotlib.colormaps["magma"](np.linspace(0, 1, 256))[:, :3] * 255
+).astype(np.uint8)
+
+
+def save_spectrogram_image(log_mel_spect: np.ndarray, image_file_path: str):
+    """Colormap a (log) spectrogram and save it as an image, without a figure."""
+    low, high = log_mel_spect.min(), log_mel_spect.max()
+    scaled = (log_mel_spect - low) / max(high - low, 1e-9)
+    rgb = SPECTROGRAM_LUT[(scaled * 255).astype(np.uint8)]
+    # low frequencies go to the bottom of the image
+    image = Image.fromarray(np.ascontiguousarray(rgb[::-1]))
+    # the image is decorative, favor encoding speed over file size
+    image.resize(SPECTROGRAM_IMAGE_SIZE).save(image_file_path, compress_level=1)
+
+
 def finish_track(track: NendoTrack, add_to_collection_id: str):
     nd = Nendo()
     if add_to_collection_id is not None and len(add_to_collection_id) > 0:
@@ -37,18 +55,12 @@ def finish_track(track: NendoTrack, add_to_collection_id: str):
     y, sr = librosa.load(track.resource.src, sr=None)
     mel_spect = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=256)
     log_mel_spect = librosa.power_to_db(mel_spect, ref=np.max)
-    plt.figure(figsize=(10, 4))
-    librosa.display.specshow(log_mel_spect, sr=sr, x_axis="time", y_axis="mel")
-    plt.axis("off")
-    plt.xticks([]), plt.yticks([])
-    plt.subplots_adjust(left=0, right=1, top=1, bottom=0)
     image_file_path = os.path.join(
         nd.config.library_path,
         "images/",
         f"{uuid.uuid4()}.png",
     )
-    plt.savefig(image_file_path, bbox_inches="tight", pad_inches=0)
-    plt.close()
+    save_spectrogram_image(log_mel_spect, image_file_path)
     image_resource = NendoResource(
         file_path=os.path.dirname(image_file_path),
         file_name=os.path.basename(image_file_path),
@@ -1,6 +1,5 @@
 # -*- encoding: utf-8 -*-
 """Nendo API Server authentication and authorization database schema and functions."""
-import asyncio
 from typing import AsyncGenerator, List
 
 from config import Settings
@@ -60,6 +59,5 @@ async def get_active_user_ids() -> List[str]:
         return [str(user_id) for user_id in user_ids]
 
 
-def close_db():
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(engine.dispose())
+async def close_db():
+    await engine.dispose()
@@ -156,3 +156,5 @@ auth_backend = AuthenticationBackend(
 fastapi_users = FastAPIUsers[User, uuid.UUID](get_user_manager, [auth_backend])
 
 current_active_user = fastapi_users.current_user(active=True)
+current_user = fastapi_users.current_user()
+current_optional_user = fastapi_users.current_user(optional=True)
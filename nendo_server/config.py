@@ -40,6 +40,10 @@ class Settings(BaseSettings):
     chunk_actions: bool = Field(default=False)
     default_action_timeout: int = Field(default=-1)
     default_track_processing_timeout: int = Field(default=600)
+    # size of the threadpool that runs blocking route work (uploads, downloads,
+    # library calls); raise it together with the expected upload concurrency
+    num_threadpool_workers: int = Field(default=200)
+    max_concurrent_uploads: int = Field(default=16)
 
     """
     Google OAuth integration
@@ -74,6 +78,17 @@ class Settings(BaseSettings):
     postgres_password: str = Field(default="nendo")
     postgres_host: str = Field(default="localhost:5432")
     postgres_db: str = Field(default="nendo")
+    # every server process opens up to (pool_size + max_overflow) connections
+    # per engine: the sync engine plus the async engine used by the mashuper
+    # scene routes, i.e. 15 + 5 = 20 per process and 80 for `gunicorn -w 4`.
+    # The nendo library's own engine comes on top, so keep the total of
+    # workers * engines * (size + overflow) below postgres' max_connections
+    postgres_pool_size: int = Field(default=10)
+    postgres_max_overflow: int = Field(default=5)
+    postgres_async_pool_size: int = Field(default=2)
+    postgres_async_max_overflow: int = Field(default=3)
+    postgres_pool_timeout: int = Field(default=30)
+    postgres_pool_recycle: int = Field(default=3600)
 
     """
     REDIS SERVER CONFIG
@@ -6,6 +6,7 @@ from typing import List, Optional
 
 from config import Settings
 from sqlalchemy import Engine, create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
 
 from . import model
 from .model import UserInviteCodeDB
@@ -22,14 +23,32 @@ class PostgresDB(SQLAlchemyDB):
     def _connect(self, db: Optional[Engine] = None):
         """Open Postgres session."""
         self.logger.info("Connecting to postgres host %s", self.config.postgres_host)
-        engine_string = (
-            "postgresql://"
+        connection = (
             f"{self.config.postgres_user}:"
             f"{self.config.postgres_password}@"
             f"{self.config.postgres_host}/"
             f"{self.config.postgres_db}"
         )
-        self.db = db or create_engine(engine_string)
+        pool_options = {
+            "pool_timeout": self.config.postgres_pool_timeout,
+            # drop connections closed by the server or a proxy before using them
+            "pool_pre_ping": True,
+            "pool_recycle": self.config.postgres_pool_recycle,
+        }
+        self.db = db or create_engine(
+            f"postgresql://{connection}",
+            pool_size=self.config.postgres_pool_size,
+            max_overflow=self.config.postgres_max_overflow,
+            **pool_options,
+        )
+        # for routes that shouldn't block the event loop on queries,
+        # only the mashuper scenes so far, so a small pool suffices
+        self.async_db = create_async_engine(
+            f"postgresql+asyncpg://{connection}",
+            pool_size=self.config.postgres_async_pool_size,
+            max_overflow=self.config.postgres_async_max_overflow,
+            **pool_options,
+        )
         model.Base.metadata.create_all(bind=self.db)
 
         self.logger.info("PostgresDBLibrary initialized successfully.")
@@ -2,21 +2,24 @@
 """NendoServer SQLAlchemy DB."""
 from __future__ import annotations
 
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
 from typing import TYPE_CHECKING, Optional
 
 from config import Settings
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 if TYPE_CHECKING:
     import logging
 
     from sqlalchemy.engine.base import Engine
+    from sqlalchemy.ext.asyncio import AsyncEngine
 
 
 class SQLAlchemyDB:
     config: Settings = None
     db: Engine = None
+    async_db: AsyncEngine = None
     logger: logging.Logger
 
     def __init__(
@@ -50,9 +53,28 @@ class SQLAlchemyDB:
         finally:
             session.close()
 
+    @asynccontextmanager
+    async def async_session_scope(self):
+        """Provide a transactional scope around a series of async operations."""
+        async with AsyncSession(
+            bind=self.async_db, autoflush=False, expire_on_commit=False,
+        ) as session:
+            try:
+                yield session
+                await session.commit()
+            except:
+                await session.rollback()
+                raise
+
     def _disconnect(self):
         """Dispose the database engine."""
         if hasattr(self, "db"):
             # self.db.close()
             self.db.dispose()
             del self.db
+
+    async def _disconnect_async(self):
+        """Dispose the async database engine."""
+        if self.async_db is not None:
+            await self.async_db.dispose()
+            self.async_db = None
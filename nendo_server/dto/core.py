@@ -6,14 +6,18 @@ from __future__ import annotations
 from typing import Any, Dict, List, Optional
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, field_validator
 
 from nendo import NendoCollectionSlim, NendoTrackSlim
 
+PLUGIN_DATA_MAX_LENGTH = 2000
+
 
 class PluginDataSmall(BaseModel):
     """Plugin data (small) class."""
 
+    model_config = ConfigDict(from_attributes=True)
+
     id: UUID
     user_id: UUID
     plugin_name: str
@@ -21,8 +25,20 @@ class PluginDataSmall(BaseModel):
     key: str
     value: str
 
+    @field_validator("value", mode="before")
+    @classmethod
+    def truncate_value(cls, v: Any) -> Any:
+        """Truncate long values, listings don't need e.g. full embeddings."""
+        if isinstance(v, str) and len(v) > PLUGIN_DATA_MAX_LENGTH:
+            return v[:PLUGIN_DATA_MAX_LENGTH] + " [...]"
+        return v
+
+
 class ResourceMetaSmall(BaseModel):
     """ResourceMeta (small) class."""
+
+    model_config = ConfigDict(from_attributes=True)
+
     sr: Optional[int] = None
     original_filename: Optional[str] = None
     image_type: Optional[str] = None
@@ -30,6 +46,8 @@ class ResourceMetaSmall(BaseModel):
 class ResourceSmall(BaseModel):
     """Resource (small) class."""
 
+    model_config = ConfigDict(from_attributes=True)
+
     id: UUID
     file_path: str
     file_name: str
@@ -40,6 +58,8 @@ class ResourceSmall(BaseModel):
 class RelationshipSmall(BaseModel):
     """Relationship (small) class."""
 
+    model_config = ConfigDict(from_attributes=True)
+
     id: UUID
     source_id: UUID
     target_id: UUID
@@ -64,6 +84,8 @@ class CollectionCollectionRelationshipSmall(RelationshipSmall):
 class TrackSmall(BaseModel):
     """Track (small) class."""
 
+    model_config = ConfigDict(from_attributes=True)
+
     id: UUID
     user_id: UUID
     track_type: str
@@ -78,6 +100,8 @@ class TrackSmall(BaseModel):
 class CollectionSmall(BaseModel):
     """Collection (small) class."""
 
+    model_config = ConfigDict(from_attributes=True)
+
     id: UUID
     name: str
     description: str
@@ -110,6 +110,10 @@ class NendoAssetsHandler(ABC):
             else:
                 subprocess.call([
                     "ffmpeg",
+                    "-nostdin",
+                    "-hide_banner",
+                    "-loglevel",
+                    "error",
                     "-i",
                     file_path,
                     "-ab",
@@ -2,10 +2,14 @@
 """Handler for collections."""
 from __future__ import annotations
 
+import functools
 import logging
+import threading
 from abc import ABC, abstractmethod
 from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
 
+from cachetools import TTLCache
+
 if TYPE_CHECKING:
     import uuid
 
@@ -13,11 +17,58 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# bounds how long reads can miss writes made outside this process,
+# e.g. by action workers adding tracks to collections
+COLLECTIONS_CACHE_TTL = 10  # seconds
+
+
+def _cached_read(func):
+    """Cache a handler read, keyed by the handler's current cache version."""
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        key = (
+            self._cache_version,
+            func.__name__,
+            repr(args),
+            repr(sorted(kwargs.items())),
+        )
+        with self._cache_lock:
+            if key in self._cache:
+                return self._cache[key]
+        result = func(self, *args, **kwargs)
+        # don't remember misses, the collection may be created by a worker
+        if result is not None:
+            with self._cache_lock:
+                self._cache[key] = result
+        return result
+
+    return wrapper
+
+
+def _invalidates_cache(func):
+    """Invalidate all cached reads once the wrapped write has finished."""
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            self.invalidate_cache()
+
+    return wrapper
+
 
 class NendoCollectionsHandler(ABC):
     nendo_instance: Nendo = None
     logger: logging.Logger = None
 
+    def invalidate_cache(self):
+        """Drop all cached reads, e.g. after tracks were deleted.
+
+        Handlers that don't cache reads have nothing to drop.
+        """
+
     @abstractmethod
     def get_collection(self, collection_id: str) -> NendoCollection:
         """Get a collection by ID.
@@ -142,6 +193,33 @@ class NendoCollectionsHandler(ABC):
         """
         raise NotImplementedError
 
+    @abstractmethod
+    def add_tracks_to_collection_by_filter(
+        self,
+        collection_id: str,
+        filters: Optional[Dict[str, Any]] = None,
+        search_meta: Optional[Dict[str, List[str]]] = None,
+        track_type: Optional[List[str]] = None,
+        related_collection_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> NendoCollection:
+        """Add all tracks matching the given filters to a collection.
+
+        Args:
+        ----
+            collection_id (str): ID of the collection.
+            filters (Optional[Dict[str, Any]]): Filters on the track fields.
+            search_meta (Optional[Dict[str, List[str]]]): Search terms for the track meta.
+            track_type (Optional[List[str]]): Track types to match.
+            related_collection_id (Optional[str]): Only match tracks in this collection.
+            user_id (Optional[str]): ID of the user owning the tracks.
+
+        Returns:
+        -------
+            NendoCollection: The updated collection.
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def delete_collection(self, collection_id: str) -> bool:
         """Delete a collection.
@@ -175,6 +253,31 @@ class NendoCollectionsHandler(ABC):
         """
         raise NotImplementedError
 
+    @abstractmethod
+    def remove_tracks_from_collection_by_filter(
+        self,
+        collection_id: str,
+        filters: Optional[Dict[str, Any]] = None,
+        search_meta: Optional[Dict[str, List[str]]] = None,
+        track_type: Optional[List[str]] = None,
+        user_id: Optional[str] = None,
+    ) -> bool:
+        """Remove all tracks matching the given filters from a collection.
+
+        Args:
+        ----
+            collection_id (str): ID of the collection.
+            filters (Optional[Dict[str, Any]]): Filters on the track fields.
+            search_meta (Optional[Dict[str, List[str]]]): Search terms for the track meta.
+            track_type (Optional[List[str]]): Track types to match.
+            user_id (Optional[str]): ID of the user owning the tracks.
+
+        Returns:
+        -------
+            Bool
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def add_related_collection(
         self,
@@ -223,13 +326,28 @@ class LocalCollectionsHandler(NendoCollectionsHandler):
     def __init__(self, nendo_instance, logger):
         self.nendo_instance = nendo_instance
         self.logger = logger
-
-    def get_collection(self, collection_id: str) -> NendoCollection:
+        self._cache = TTLCache(maxsize=10_000, ttl=COLLECTIONS_CACHE_TTL)
+        self._cache_lock = threading.Lock()
+        self._cache_version = 0
+
+    def invalidate_cache(self):
+        """Drop all cached reads, e.g. after tracks were deleted."""
+        with self._cache_lock:
+            self._cache_version += 1
+            self._cache.clear()
+
+    def _get_collection_uncached(self, collection_id: str) -> NendoCollection:
+        # writes must start from the current state, not a shared cached object
         return self.nendo_instance.library.get_collection(
             collection_id=collection_id,
             get_related_tracks=False,
         )
 
+    @_cached_read
+    def get_collection(self, collection_id: str) -> NendoCollection:
+        return self._get_collection_uncached(collection_id)
+
+    @_cached_read
     def get_collection_size(self, collection_id: str) -> int:
         return self.nendo_instance.library.collection_size(
             collection_id=collection_id,
@@ -241,6 +359,7 @@ class LocalCollectionsHandler(NendoCollectionsHandler):
             order="desc",
         )
 
+    @_cached_read
     def get_collections(
         self,
         user_id: Optional[uuid.UUID] = None,
@@ -259,6 +378,7 @@ class LocalCollectionsHandler(NendoCollectionsHandler):
             order_by="created_at",
         )
 
+    @_invalidates_cache
     def create_collection(
         self,
         name: str,
@@ -275,6 +395,7 @@ class LocalCollectionsHandler(NendoCollectionsHandler):
             track_ids=track_ids,
         )
 
+    @_invalidates_cache
     def update_collection(
         self,
         collection_id: Union[str, uuid.UUID],
@@ -283,14 +404,19 @@ class LocalCollectionsHandler(NendoCollectionsHandler):
         collection_type: Optional[str] = None,
         user_id: Optional[Union[str, uuid.UUID]] = None,
     ) -> NendoCollection:
-        collection = self.get_collection(collection_id=collection_id)
-        collection.name = name
-        collection.description = description
-        collection.collection_type = collection_type
+        collection = self._get_collection_uncached(collection_id)
+        # only overwrite the fields that were given
+        if name is not None:
+            collection.name = name
+        if description is not None:
+            collection.description = description
+        if collection_type is not None:
+            collection.collection_type = collection_type
         return self.nendo_instance.library.update_collection(
             collection=collection,
         )
 
+    @_invalidates_cache
     def add_track_to_collection(
         self, collection_id: str, track_id: str,
     ) -> NendoCollection:
@@ -299,21 +425,63 @@ class LocalCollectionsHandler(NendoCollectionsHandler):
             track_id=track_id,
         )
     
+    @_invalidates_cache
     def add_tracks_to_collection(
         self, collection_id: str, track_ids: List[str]
     ) -> NendoCollection:
+        # one batched library call; duplicate IDs would only cause extra writes
         return self.nendo_instance.library.add_tracks_to_collection(
-            track_ids=track_ids,
+            track_ids=list(dict.fromkeys(track_ids)),
+            collection_id=collection_id,
+        )
+
+    def _filter_track_ids(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        search_meta: Optional[Dict[str, List[str]]] = None,
+        track_type: Optional[List[str]] = None,
+        collection_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> List[str]:
+        # unlike the tracks handler's get_tracks, skip the extra count query
+        tracks = self.nendo_instance.library.filter_tracks_by_meta(
+            search_meta=search_meta,
+            filters=filters,
+            collection_id=collection_id,
+            track_type=track_type,
+            user_id=user_id,
+        )
+        return [str(track.id) for track in tracks]
+
+    def add_tracks_to_collection_by_filter(
+        self,
+        collection_id: str,
+        filters: Optional[Dict[str, Any]] = None,
+        search_meta: Optional[Dict[str, List[str]]] = None,
+        track_type: Optional[List[str]] = None,
+        related_collection_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> NendoCollection:
+        track_ids = self._filter_track_ids(
+            filters=filters,
+            search_meta=search_meta,
+            track_type=track_type,
+            collection_id=related_collection_id,
+            user_id=user_id,
+        )
+        return self.add_tracks_to_collection(
             collection_id=collection_id,
+            track_ids=track_ids,
         )
         
 
+    @_invalidates_cache
     def save_collection_from_temp(
         self,
         collection_id: str,
         name: str,
     ) -> NendoCollection:
-        collection = self.get_collection(collection_id=collection_id)
+        collection = self._get_collection_uncached(collection_id)
         track_ids = [rt.relationship_source.id for rt in collection.related_tracks]
         return self.nendo_instance.library.add_collection(
             name=name,
@@ -325,6 +493,7 @@ class LocalCollectionsHandler(NendoCollectionsHandler):
             meta=collection.meta,
         )
 
+    @_invalidates_cache
     def delete_collection(self, collection_id: str, user_id: str) -> bool:
         return self.nendo_instance.library.remove_collection(
             collection_id=collection_id,
@@ -332,6 +501,7 @@ class LocalCollectionsHandler(NendoCollectionsHandler):
             remove_relationships=True,
         )
 
+    @_invalidates_cache
     def remove_track_from_collection(
         self,
         track_id: str,
@@ -342,6 +512,7 @@ class LocalCollectionsHandler(NendoCollectionsHandler):
             collection_id=collection_id,
         )
         
+    @_invalidates_cache
     def remove_tracks_from_collection(
         self,
         track_ids: List[str],
@@ -349,9 +520,30 @@ class LocalCollectionsHandler(NendoCollectionsHandler):
     ) -> bool:
         return self.nendo_instance.library.remove_tracks_from_collection(
             collection_id=collection_id,
+            track_ids=list(dict.fromkeys(track_ids)),
+        )
+
+    def remove_tracks_from_collection_by_filter(
+        self,
+        collection_id: str,
+        filters: Optional[Dict[str, Any]] = None,
+        search_meta: Optional[Dict[str, List[str]]] = None,
+        track_type: Optional[List[str]] = None,
+        user_id: Optional[str] = None,
+    ) -> bool:
+        track_ids = self._filter_track_ids(
+            filters=filters,
+            search_meta=search_meta,
+            track_type=track_type,
+            collection_id=collection_id,
+            user_id=user_id,
+        )
+        return self.remove_tracks_from_collection(
             track_ids=track_ids,
+            collection_id=collection_id,
         )
 
+    @_invalidates_cache
     def add_related_collection(
         self,
         track_ids: List[Union[str, uuid.UUID]],
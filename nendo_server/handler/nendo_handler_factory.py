@@ -2,15 +2,21 @@
 """Factory for creating handlers."""
 from abc import ABC, abstractmethod
 from enum import Enum
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, Dict
 
+from fastapi import Depends
 from handler.nendo_actions_handler import LocalActionsHandler, RemoteActionsHandler
-from handler.nendo_assets_handler import LocalAssetsHandler
+from handler.nendo_assets_handler import LocalAssetsHandler, NendoAssetsHandler
 from handler.nendo_collections_handler import (
     LocalCollectionsHandler,
+    NendoCollectionsHandler,
     RemoteCollectionsHandler,
 )
-from handler.nendo_tracks_handler import LocalTracksHandler, RemoteTracksHandler
+from handler.nendo_tracks_handler import (
+    LocalTracksHandler,
+    NendoTracksHandler,
+    RemoteTracksHandler,
+)
 from handler.nendo_models_handler import ModelsHandler
 
 if TYPE_CHECKING:
@@ -34,14 +40,23 @@ class NendoHandlerFactory(ABC):
         self.redis = app_state.redis
         self.config = app_state.config
         self.worker_manager = app_state.worker_manager
+        # handlers are stateless, so one instance per type can be shared
+        self._handlers: Dict[HandlerType, Any] = {}
 
-    @abstractmethod
     def create(self, handler_type: HandlerType):
+        handler = self._handlers.get(handler_type)
+        if handler is None:
+            handler = self._build(handler_type)
+            self._handlers[handler_type] = handler
+        return handler
+
+    @abstractmethod
+    def _build(self, handler_type: HandlerType):
         raise NotImplementedError
 
 
 class LocalNendoHandlerFactory(NendoHandlerFactory):
-    def create(self, handler_type: HandlerType):
+    def _build(self, handler_type: HandlerType):
         if handler_type == HandlerType.TRACKS:
             return LocalTracksHandler(self.nendo_instance, self.logger)
         if handler_type == HandlerType.ASSETS:
@@ -64,7 +79,7 @@ class LocalNendoHandlerFactory(NendoHandlerFactory):
 
 
 class RemoteNendoHandlerFactory(NendoHandlerFactory):
-    def create(self, handler_type: HandlerType):
+    def _build(self, handler_type: HandlerType):
         if handler_type == HandlerType.TRACKS:
             return RemoteTracksHandler(self.nendo_instance, self.logger)
         if handler_type == HandlerType.ASSETS:
@@ -86,3 +101,24 @@ class RemoteNendoHandlerFactory(NendoHandlerFactory):
             return ModelsHandler(self.nendo_instance, self.logger)
 
         raise Exception("Unknown handler type: " + str(handler_type))
+
+
+async def get_collections_handler(
+    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
+) -> NendoCollectionsHandler:
+    """Provide the collections handler as a route dependency."""
+    return handler_factory.create(handler_type=HandlerType.COLLECTIONS)
+
+
+async def get_tracks_handler(
+    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
+) -> NendoTracksHandler:
+    """Provide the tracks handler as a route dependency."""
+    return handler_factory.create(handler_type=HandlerType.TRACKS)
+
+
+async def get_assets_handler(
+    handler_factory: NendoHandlerFactory = Depends(NendoHandlerFactory),
+) -> NendoAssetsHandler:
+    """Provide the assets handler as a route dependency."""
+    return handler_factory.create(handler_type=HandlerType.ASSETS)
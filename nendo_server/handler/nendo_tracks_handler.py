@@ -172,6 +172,21 @@ class NendoTracksHandler(ABC):
         """
         raise NotImplementedError
 
+    @abstractmethod
+    def delete_tracks(self, track_ids: List[str], user_id: str) -> List[str]:
+        """Delete multiple tracks by ID.
+
+        Args:
+        ----
+            track_ids (List[str]): track IDs
+            user_id (str): ID of the user owning the tracks
+
+        Returns:
+        -------
+            List[str]: IDs of the tracks that were deleted.
+        """
+        raise NotImplementedError
+
 
 class LocalTracksHandler(NendoTracksHandler):
     def __init__(self, nendo_instance, logger):
@@ -353,6 +368,12 @@ class LocalTracksHandler(NendoTracksHandler):
             self.logger.error(e)
             return False
 
+    def delete_tracks(self, track_ids: List[str], user_id: str) -> List[str]:
+        return [
+            track_id for track_id in track_ids
+            if self.delete_track(track_id=track_id, user_id=user_id)
+        ]
+
 
 class RemoteTracksHandler(LocalTracksHandler):
     pass
@@ -1,6 +1,8 @@
 # -*- encoding: utf-8 -*-
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import importlib
 import os
 import sys
@@ -8,13 +10,17 @@ from pathlib import Path
 
 import config
 import uvicorn
+from anyio import to_thread
 from api.router_api import api_router
+from api.utils import JSONGZipMiddleware
 from auth.auth_db import close_db, create_db_and_tables, get_active_user_ids
 from auth.router_auth import auth_router
 from db import PostgresDB
-from fastapi import APIRouter, FastAPI
+from fastapi import APIRouter, FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
+from fastapi.utils import is_body_allowed_for_status_code
 from handler.nendo_handler_factory import (
     LocalNendoHandlerFactory,
     NendoHandlerFactory,
@@ -23,6 +29,7 @@ from handler.nendo_handler_factory import (
 from logger.nendo_logger import create_logger
 from nendo import Nendo
 from redis import Redis
+from starlette.exceptions import HTTPException as StarletteHTTPException
 from worker.worker_manager import LocalWorkerManager, RemoteWorkerManager
 
 LOCK_FILE = "/tmp/rq_init.lock"
@@ -41,7 +48,10 @@ def is_master_process() -> bool:
 def create_app():
     # configure app
     server_config = config.get_settings()
-    app = FastAPI(title=server_config.server_name)
+    app = FastAPI(
+        title=server_config.server_name,
+        default_response_class=ORJSONResponse,
+    )
 
     # load all app routes
     project_root = os.path.dirname(os.path.realpath(__file__))
@@ -77,6 +87,17 @@ def create_app():
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    app.add_middleware(JSONGZipMiddleware, minimum_size=1024)
+
+    # same as FastAPI's default handler, but encodes the error with orjson
+    @app.exception_handler(StarletteHTTPException)
+    async def http_exception_handler(request: Request, exc: StarletteHTTPException):
+        headers = getattr(exc, "headers", None)
+        if not is_body_allowed_for_status_code(exc.status_code):
+            return Response(status_code=exc.status_code, headers=headers)
+        return ORJSONResponse(
+            {"detail": exc.detail}, status_code=exc.status_code, headers=headers,
+        )
 
     @app.on_event("startup")
     async def startup_event():
@@ -85,10 +106,17 @@ def create_app():
         try:
             app.state.logger = logger
             app.state.config = server_config
+            app.state.is_master = False
 
             app.state.logger.info(
                 f'SERVER STARTING in "{server_config.environment}"',
             )
+            app.state.logger.info(
+                f"Using event loop {type(asyncio.get_running_loop()).__name__}",
+            )
+            to_thread.current_default_thread_limiter().total_tokens = (
+                server_config.num_threadpool_workers
+            )
 
             if server_config.environment == config.Environment.LOCAL:
                 app.state.db = PostgresDB(logger=logger)
@@ -111,9 +139,7 @@ def create_app():
                     logger=logger,
                 )
 
-                app.dependency_overrides[
-                    NendoHandlerFactory
-                ] = lambda: LocalNendoHandlerFactory(app.state)
+                app.state.handler_factory = LocalNendoHandlerFactory(app.state)
 
             if server_config.environment == config.Environment.REMOTE:
                 app.state.db = PostgresDB(logger=logger)
@@ -142,9 +168,13 @@ def create_app():
                     logger=logger,
                 )
 
-                app.dependency_overrides[
-                    NendoHandlerFactory
-                ] = lambda: RemoteNendoHandlerFactory(app.state)
+                app.state.handler_factory = RemoteNendoHandlerFactory(app.state)
+
+            # an async dependency is called inline instead of via the threadpool
+            async def get_handler_factory() -> NendoHandlerFactory:
+                return app.state.handler_factory
+
+            app.dependency_overrides[NendoHandlerFactory] = get_handler_factory
 
             # load app models
             for subdir in os.listdir(modules_dir):
@@ -174,7 +204,8 @@ def create_app():
             os.makedirs(images_path, exist_ok=True)
 
             # initialize queues and workers
-            if is_master_process():
+            app.state.is_master = is_master_process()
+            if app.state.is_master:
                 user_ids = await get_active_user_ids()
                 app.state.worker_manager.init_queues_and_workers(user_ids)
 
@@ -182,15 +213,27 @@ def create_app():
             logger.error(f"Nendo startup error: {e}")
             sys.exit()
 
-    return app
-
     @app.on_event("shutdown")
     async def shutdown_event():
-        if is_master_process():
+        if getattr(app.state, "is_master", False):
             # Cleanup, e.g., remove the lock file
-            os.remove(LOCK_FILE)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(LOCK_FILE)
+        try:
+            await app.state.db._disconnect_async()
+        except Exception as e:
+            app.state.logger.error(
+                f"ERROR attempting to close app.state.db._disconnect_async(): {e}",
+            )
         close_db_connections()
-    return None
+        try:
+            await close_db()
+        except Exception as e:
+            app.state.logger.error(
+                f"ERROR attempting to close the authdb close_db(): {e}",
+            )
+
+    return app
 
 
 app = create_app()
@@ -200,25 +243,18 @@ def close_db_connections():
     try:
         app.state.db._disconnect()
     except Exception as e:
-        app.state.logger(
+        app.state.logger.error(
             f"ERROR attempting to close app.state.db._disconnect(): {e}",
         )
 
     try:
         app.state.nendo_instance.library._disconnect()
     except Exception as e:
-        app.state.logger(
+        app.state.logger.error(
             "ERROR attempting to close "
             f"app.state.nendo_instance.library._disconnect(): {e}",
         )
 
-    try:
-        close_db()
-    except Exception as e:
-        app.state.logger(
-            f"ERROR attempting to close the authdb close_db(): {e}",
-        )
-
 
 app.mount(
     "/assets",
@@ -232,6 +268,8 @@ if __name__ == "__main__":
         app,
         host="127.0.0.1",
         port=8000,
+        loop="uvloop",
+        http="httptools",
         log_level=settings.log_level,
         log_config=os.path.join(settings.base_dir, "log_conf.yaml"),
     )
@@ -1,10 +1,12 @@
 # -*- encoding: utf-8 -*-
 """Utility functions used by Nendo."""
+import copy
 import json
 import os
 import uuid
 from collections.abc import Mapping
 from datetime import date, datetime
+from functools import lru_cache
 import re
 import sys
 from typing import List, Optional
@@ -12,14 +14,18 @@ from urllib.parse import unquote
 
 import librosa
 import librosa.display
+import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
 from nendo import Nendo, NendoResource
-from pydantic import BaseModel, parse_obj_as
+from pydantic import BaseModel
 from sqlalchemy.dialects.postgresql import JSON
 from sqlalchemy.types import TypeDecorator
 from sqlalchemy_json import NestedMutableDict, NestedMutableList
 
+# rendering is headless, don't let matplotlib probe for a GUI backend
+matplotlib.use("Agg")
+
 
 class JSONEncodedDict(TypeDecorator):
     impl = JSON
@@ -59,50 +65,67 @@ def create_spectrogram(
     # TODO turn into a plugin
     nd = Nendo()
     rendered_spectrograms = 0
-    for target_id in track_ids:
-        image_file_path = os.path.join(
-            nd.config.library_path,
-            "images/",
-            f"{uuid.uuid4()}.png",
-        )
-        track = nd.get_track(target_id)
-        y, sr = librosa.load(track.resource.src, sr=None)
-
-        # Compute the Mel spectrogram
-        mel_spect = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=n_mels)
-
-        # Convert to log scale
-        log_mel_spect = librosa.power_to_db(mel_spect, ref=np.max)
-
-        # Plot the spectrogram
-        plt.figure(figsize=(10, 4))
-        librosa.display.specshow(log_mel_spect, sr=sr, x_axis="time", y_axis="mel")
-
-        # Remove axes, legends, and white borders
-        plt.axis("off")
-        plt.xticks([]), plt.yticks([])  # Remove axis ticks
-        plt.subplots_adjust(left=0, right=1, top=1, bottom=0)
-
-        # Save the figure
-        plt.savefig(image_file_path, bbox_inches="tight", pad_inches=0)
-        plt.close()
-        image_resource = NendoResource(
-            file_path=os.path.dirname(image_file_path),
-            file_name=os.path.basename(image_file_path),
-            resource_type="image",
-            location="local",
-            meta={
-                "image_type": "spectrogram",
-            },
-        )
-        track.images = [image_resource.model_dump()]
-        track.save()
-        rendered_spectrograms += 1
+    images_dir = os.path.join(nd.config.library_path, "images/")
+    # one figure is reused for all tracks instead of creating one per track
+    fig, ax = plt.subplots(figsize=(10, 4))
+    fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
+    try:
+        for target_id in track_ids:
+            image_file_path = os.path.join(images_dir, f"{uuid.uuid4()}.png")
+            track = nd.get_track(target_id)
+            y, sr = librosa.load(track.resource.src, sr=None)
+
+            # Compute the Mel spectrogram
+            mel_spect = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=n_mels)
+
+            # Convert to log scale
+            log_mel_spect = librosa.power_to_db(mel_spect, ref=np.max)
+
+            # Plot the spectrogram without axes, legends and white borders
+            ax.cla()
+            librosa.display.specshow(
+                log_mel_spect, sr=sr, x_axis="time", y_axis="mel", ax=ax,
+            )
+            ax.set_axis_off()
+
+            # Save the figure
+            # the axes already fill the figure, so no tight bbox pass is needed
+            fig.savefig(
+                image_file_path,
+                pad_inches=0,
+                pil_kwargs={"compress_level": 1},
+            )
+            image_resource = NendoResource(
+                file_path=os.path.dirname(image_file_path),
+                file_name=os.path.basename(image_file_path),
+                resource_type="image",
+                location="local",
+                meta={
+                    "image_type": "spectrogram",
+                },
+            )
+            track.images = [image_resource.model_dump()]
+            track.save()
+            rendered_spectrograms += 1
+    finally:
+        plt.close(fig)
     return (
         f"Successfully rendered {rendered_spectrograms}/{len(track_ids)} "
         "spectrograms"
     )
 
+# a quoted phrase or a bare word
+_TOKEN_RE = re.compile(r'(?:"([^"]*)")|(\S+)')
+
+
+def _tokenize_search(search: str) -> List[str]:
+    """Split a search string into bare words and quoted phrases."""
+    # without quotes the tokens are exactly the whitespace-separated words
+    if '"' not in search:
+        return search.split()
+    return [quoted or bare for quoted, bare in _TOKEN_RE.findall(search)]
+
+
 class TrackSearchFilterParams(BaseModel):
     """Filter parameters object."""
 
@@ -111,49 +134,68 @@ class TrackSearchFilterParams(BaseModel):
 
 
 def extract_search_filter(searchfilter: Optional[str] = None):
+    # most requests carry no filter at all, skip parsing and cache lookup
+    if not searchfilter:
+        return {"search_meta": {"": []}, "filters": {}}
+    # clients repeat the same filter across pages and bulk actions, so the
+    # parsed result is cached; callers get their own copy to mutate freely
+    return copy.deepcopy(_parse_search_filter(searchfilter))
+
+
+_FLOAT_MIN = sys.float_info.min
+_FLOAT_MAX = sys.float_info.max
+
+
+def _apply_metadata_filter(f: dict, filters: dict, search_meta: dict):
+    search_meta[f["key"]] = _tokenize_search(f["value"])
+
+
+def _apply_range_filter(f: dict, filters: dict, search_meta: dict):
+    value_min = float(f["value_min"]) if f["value_min"] is not None else _FLOAT_MIN
+    value_max = float(f["value_max"]) if f["value_max"] is not None else _FLOAT_MAX
+    filters[f["key"]] = (value_min, value_max)
+
+
+def _apply_key_filter(f: dict, filters: dict, search_meta: dict):
+    filters["key"] = f["value_key"]
+    filters["scale"] = f["value_scale"]
+
+
+def _apply_multiselect_filter(f: dict, filters: dict, search_meta: dict):
+    for value in f["values"]:
+        filters[f["key"]] = value
+
+
+def _apply_value_filter(f: dict, filters: dict, search_meta: dict):
+    filters[f["key"]] = f["value"]
+
+
+# filters are applied by their type, anything else is a plain value filter
+_FILTER_TYPES = {
+    "range": _apply_range_filter,
+    "key": _apply_key_filter,
+    "multiselect": _apply_multiselect_filter,
+}
+
+
+@lru_cache(maxsize=1024)
+def _parse_search_filter(searchfilter: Optional[str] = None):
     search_params = TrackSearchFilterParams()
-    # URL decode the JSON parameter
     if searchfilter is not None and searchfilter != "":
-        decoded_search_filter = unquote(searchfilter)
-        if decoded_search_filter is not None:
-            search_params = parse_obj_as(
-                TrackSearchFilterParams,
-                json.loads(decoded_search_filter),
-            )
+        # URL decode the JSON parameter, unless it isn't percent-encoded
+        if "%" in searchfilter:
+            searchfilter = unquote(searchfilter)
+        # parse and validate the JSON in a single pydantic-core pass
+        search_params = TrackSearchFilterParams.model_validate_json(searchfilter)
 
-    matched = re.findall(r'(?:"([^"]*)")|(\S+)', search_params.search)
-    search_list = [x[0] if x[0] else x[1] for x in matched]
-    search_meta = {"": search_list}
+    search_meta = {"": _tokenize_search(search_params.search)}
     filters = {}
     for f in search_params.filters:
         if f["search"] == "metadata":
-            matched = re.findall(r'(?:"([^"]*)")|(\S+)', f["value"])
-            search_list = [x[0] if x[0] else x[1] for x in matched]
-            search_meta.update({f["key"]: search_list})
-        elif f["type"] == "range":
-            value_min = (
-                float(f["value_min"]) if
-                f["value_min"] is not None else
-                sys.float_info.min
-            )
-            value_max = (
-                float(f["value_max"]) if
-                f["value_max"] is not None else
-                sys.float_info.max
-            )
-            filter_value = (value_min, value_max)
-            filters.update({f["key"]: filter_value})
-        elif f["type"] == "key":
-            filters.update({
-                "key": f["value_key"],
-                "scale": f["value_scale"],
-            })
-        elif f["type"] == "multiselect":
-            for value in f["values"]:
-                filters.update({f["key"]: value})
+            apply_filter = _apply_metadata_filter
         else:
-            filter_value = f["value"]
-            filters.update({f["key"]: filter_value})
+            apply_filter = _FILTER_TYPES.get(f["type"], _apply_value_filter)
+        apply_filter(f, filters, search_meta)
     return {
         "search_meta": search_meta,
         "filters": filters,